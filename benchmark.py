@@ -0,0 +1,270 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from instrument import STATS
+from solver import ParameterizedProblem, Tractability
+
+# Benchmarks of the solver hot paths on random parameterized problem classes
+#
+# Every case is a class generated from its parameter count, reduction count, size of the initial problems of the
+# reductions, density of known problems and seed, so that the same case can be run again on another commit. For
+# each case, the runner times saturation, proof searches, the listing of open problems, impacts, the impacts of
+# every open problem, the conflict check and the plan, and records the work counted by the instrumentation of each
+# operation (see instrument.py) and the peak memory it allocates
+
+# A class with the given number of parameters and reductions. The initial problem of each reduction has
+# lhs_size parameters. A third of the reductions add parameters to their initial problem, the others replace
+# some of them. About density * parameters problems are registered, half of them large tractable ones and half
+# of them small intractable ones, as in known parameterized classes
+def generate(parameters, reductions, lhs_size, density, seed=0):
+    generator = random.Random(seed)
+    names = [f"p{i}" for i in range(parameters)]
+    lhs_size = max(1, min(lhs_size, parameters - 1))
+
+    problem = ParameterizedProblem()
+    problem.name = f"R{parameters}-{reductions}-{lhs_size}-{density}-{seed}"
+    problem.set_parameters(names)
+
+    for i in range(reductions):
+        initial_problem = generator.sample(names, lhs_size)
+        others = [name for name in names if name not in initial_problem]
+        if i % 3 == 0:
+            final_problem = initial_problem + generator.sample(others, generator.randint(1, min(2, len(others))))
+        else:
+            kept = generator.sample(initial_problem, generator.randint(0, lhs_size - 1))
+            final_problem = kept + generator.sample(others, generator.randint(1, min(lhs_size, len(others))))
+        problem.register_reduction(initial_problem, final_problem)
+
+    known = max(2, round(density * parameters))
+    for i in range(known):
+        if i % 2 == 0:
+            size = generator.randint((parameters + 1) // 2, parameters)
+            problem.register_problem(generator.sample(names, size), Tractability.TRACTABLE)
+        else:
+            size = generator.randint(1, max(1, parameters // 3))
+            problem.register_problem(generator.sample(names, size), Tractability.INTRACTABLE)
+
+    return problem
+
+
+# Best time of repeat runs, with instrumentation off. Another run counts the work of the operation, summed over
+# the kinds of counters, and measures its peak memory if memory is set. Returns the result of the first run
+def measure(operation, memory, repeat=1):
+    enabled = STATS.enabled
+    STATS.enabled = False
+    try:
+        elapsed = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            outcome = operation()
+            duration = time.perf_counter() - start
+            if i == 0:
+                result, elapsed = outcome, duration
+            elapsed = min(elapsed, duration)
+
+        STATS.enabled = True
+        STATS.reset()
+        peak = None
+        if memory:
+            tracemalloc.start()
+        operation()
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        counts = {}
+        for items in STATS.counts().values():
+            for name, count in items:
+                counts[name] = counts.get(name, 0) + count
+    finally:
+        STATS.enabled = enabled
+        STATS.reset()
+
+    return result, elapsed, peak, counts
+
+
+# Runs every operation on one case. Saturation is measured on fresh copies of the generated class, so that the
+# counted pass starts from the same state as the timed one
+def run_case(case, queries=10, memory=True, repeat=1):
+    parameters, reductions, lhs_size, density, seed = case
+    generator = random.Random(seed)
+    results = []
+
+    def record(operation, measured, **counts):
+        _, elapsed, peak, work = measured
+        result = {"parameters": parameters, "reductions": reductions, "lhs_size": lhs_size, "density": density,
+                  "seed": seed, "operation": operation, "time": elapsed, "peak_memory": peak}
+        result.update(work)
+        result.update(counts)
+        results.append(result)
+
+    copies = [generate(*case) for _ in range(repeat + 1)]
+    saturated = []
+
+    def saturate():
+        saturated.append(copies.pop())
+        return saturated[-1].saturate_result()
+
+    measured = measure(saturate, memory, repeat)
+    saturation, problem = measured[0], saturated[0]
+    record("saturate", measured, tractable=saturation.tractable, intractable=saturation.intractable)
+
+    names = sorted(problem.parameters)
+    samples = [generator.sample(names, generator.randint(1, parameters)) for _ in range(queries)]
+    tractabilities = [Tractability.TRACTABLE, Tractability.INTRACTABLE]
+    for operation, shortest in [("solve", False), ("solve_shortest", True)]:
+        def solve_all():
+            return [problem.solve_result(sample, tractability, shortest=shortest)
+                    for sample, tractability in itertools.product(samples, tractabilities)]
+
+        measured = measure(solve_all, memory, repeat)
+        solved = measured[0]
+        record(operation, measured, queries=len(solved), solved=sum(result.proof is not None for result in solved))
+
+    measured = measure(lambda: list(problem.open_problems_result()), memory, repeat)
+    open_problems = measured[0]
+    record("open", measured, open=len(open_problems))
+
+    impacted = generator.sample(open_problems, min(queries, len(open_problems)))
+    measured = measure(lambda: [problem.impact_result(sorted(p)) for p in impacted], memory, repeat)
+    impacts = measured[0]
+    record("impact", measured, queries=len(impacts),
+           solved=sum(len(result.tractable) + len(result.intractable) for result in impacts))
+
+    measured = measure(lambda: problem.open_problems_result(impact=True), memory, repeat)
+    impacts = measured[0]
+    record("open_impact", measured, open=len(impacts),
+           solved=sum(len(result.tractable) + len(result.intractable) for result in impacts))
+
+    measured = measure(problem.check_result, memory, repeat)
+    record("check", measured, conflicts=len(measured[0]))
+
+    measured = measure(lambda: problem.plan_result(queries), memory, repeat)
+    steps = measured[0]
+    record("plan", measured, steps=len(steps), solved=sum(step.tractable + step.intractable for step in steps))
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    cases = list(itertools.product(args.parameters, args.reductions, args.lhs, args.density, args.seeds))
+    report = {"commit": git_commit(), "python": platform.python_version(), "results": []}
+
+    for case in cases:
+        print(f"Running {parameters_label(case)}", file=sys.stderr)
+        report["results"].extend(run_case(case, queries=args.queries, memory=args.memory, repeat=args.repeat))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+def parameters_label(case):
+    parameters, reductions, lhs_size, density, seed = case
+    return f"{parameters} parameters, {reductions} reductions of size {lhs_size}, density {density}, seed {seed}"
+
+
+# Time ratios between two reports, for the cases and operations they share
+def compare(args):
+    reports = []
+    for name in [args.base, args.new]:
+        with open(name) as f:
+            reports.append(json.load(f))
+
+    def key(result):
+        return (result["parameters"], result["reductions"], result["lhs_size"], result["density"], result["seed"],
+                result["operation"])
+
+    base = {key(result): result for result in reports[0]["results"]}
+    print(f"{reports[0]['commit']} -> {reports[1]['commit']}")
+    for result in reports[1]["results"]:
+        if key(result) not in base:
+            continue
+
+        before, after = base[key(result)]["time"], result["time"]
+        ratio = after / before if before > 0 else float("inf")
+        flag = " (slower)" if ratio > 1 + args.threshold else " (faster)" if ratio < 1 - args.threshold else ""
+        print(f"{parameters_label(key(result)[:5])}, {result['operation']}: {before:.4f}s -> {after:.4f}s, "
+              f"x{ratio:.2f}{flag}")
+
+
+def write_generated(args):
+    problem = generate(args.parameters, args.reductions, args.lhs, args.density, args.seed)
+    problem.save(args.output, verbose=False)
+    print(f"Wrote {problem.name} to {args.output}")
+
+
+def integers(value):
+    return [int(item) for item in value.split(",")]
+
+
+def floats(value):
+    return [float(item) for item in value.split(",")]
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the parameterized problem finder')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runner = commands.add_parser('run', help='run the benchmarks, and print the results as JSON')
+    runner.add_argument('--parameters', type=integers, default=[8, 12],
+                        help='parameter counts, comma-separated')
+    runner.add_argument('--reductions', type=integers, default=[10, 40], help='reduction counts, comma-separated')
+    runner.add_argument('--lhs', type=integers, default=[2],
+                        help='sizes of the initial problems of the reductions, comma-separated')
+    runner.add_argument('--density', type=floats, default=[1.0],
+                        help='registered problems per parameter, comma-separated')
+    runner.add_argument('--seeds', type=integers, default=[0], help='random seeds, comma-separated')
+    runner.add_argument('--queries', type=int, default=10,
+                        help='solve and impact queries per case, and steps of the plan')
+    runner.add_argument('--repeat', type=int, default=1,
+                        help='run each operation this many times, and keep the best time')
+    runner.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip measuring the peak memory of each operation in the pass counting its work')
+    runner.add_argument('-o', dest='output', default=None, help='write the results to this file')
+
+    comparison = commands.add_parser('compare', help='compare the times of two result files')
+    comparison.add_argument('base')
+    comparison.add_argument('new')
+    comparison.add_argument('--threshold', type=float, default=0.1,
+                            help='relative change under which times are considered equal')
+
+    generator = commands.add_parser('generate', help='write a random class to a problem file')
+    generator.add_argument('--parameters', type=int, default=12)
+    generator.add_argument('--reductions', type=int, default=20)
+    generator.add_argument('--lhs', type=int, default=2)
+    generator.add_argument('--density', type=float, default=1.0)
+    generator.add_argument('--seed', type=int, default=0)
+    generator.add_argument('-o', dest='output', required=True, help='path of the problem file')
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    {"run": run, "compare": compare, "generate": write_generated}[args.command](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
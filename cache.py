@@ -0,0 +1,123 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from journal import file_mode
+
+# Sidecar cache of a saturated problem file, next to it with a ".cache" suffix. It holds the tractable and
+# intractable status bitsets and the proof entries, and is only used when the hash it was written for matches
+# the content of the problem file
+#
+# Layout: magic, version, lattice size, content hash (32 bytes), both bitsets, then for each tractability the
+# number of proof entries followed by the entries, in the order they were recorded
+
+MAGIC = b"PPFC"
+VERSION = 1
+HEADER = struct.Struct("<4sII32s")
+COUNT = struct.Struct("<I")
+# problem, flags (1: has a predecessor, 2: has a rule), predecessor, rule initial problem, rule final problem
+ENTRY = struct.Struct("<5I")
+
+
+def cache_path(name):
+    return name + ".cache"
+
+
+# Hash of a problem file content, insensitive to the order of parameters, reductions and problems
+def content_hash(data):
+    def normalize(problem):
+        return " ".join(sorted(problem.split()))
+
+    def normalize_dic(dic):
+        return sorted([normalize(key), sorted(normalize(value) for value in values)] for key, values in dic.items())
+
+    normalized = [data["name"].strip(), normalize(data["parameters"]),
+                  normalize_dic(data["reductions"]), normalize_dic(data["antireductions"]),
+                  sorted(normalize(problem) for problem in data["tractable"]),
+                  sorted(normalize(problem) for problem in data["intractable"])]
+
+    return hashlib.sha256(json.dumps(normalized).encode()).digest()
+
+
+def bitset_length(size):
+    return (1 << size) // 8 + 1
+
+
+# Returns the tractable and intractable bitsets and proof entries, as lists of (problem, predecessor, rule), or
+# None if there is no cache for this content
+def read_cache(name, digest, size):
+    try:
+        f = open(cache_path(name), "rb")
+    except (OSError, IOError):
+        return None
+
+    with f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        with data:
+            try:
+                return _read(data, digest, size)
+            except struct.error:
+                return None
+
+
+def _read(data, digest, size):
+    magic, version, cached_size, cached_digest = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or cached_size != size or cached_digest != digest:
+        return None
+
+    length = bitset_length(size)
+    offset = HEADER.size
+    bitsets = []
+    for _ in range(2):
+        bitsets.append(int.from_bytes(data[offset:offset + length], "little"))
+        offset += length
+
+    proofs = []
+    for _ in range(2):
+        count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        entries = []
+        for problem, flags, predecessor, initial, final in ENTRY.iter_unpack(data[offset:offset + count * ENTRY.size]):
+            entries.append((problem, predecessor if flags & 1 else None, (initial, final) if flags & 2 else None))
+        offset += count * ENTRY.size
+        proofs.append(entries)
+
+    return bitsets, proofs
+
+
+# Written to a temporary file first, then moved over the previous cache, so that readers never see a partial one
+def write_cache(name, digest, size, bitsets, proofs):
+    path = cache_path(name)
+    length = bitset_length(size)
+
+    chunks = [HEADER.pack(MAGIC, VERSION, size, digest)]
+    chunks.extend(bitset.to_bytes(length, "little") for bitset in bitsets)
+    for entries in proofs:
+        chunks.append(COUNT.pack(len(entries)))
+        for problem, predecessor, rule in entries:
+            flags = (predecessor is not None) | (rule is not None) << 1
+            initial, final = rule if rule is not None else (0, 0)
+            chunks.append(ENTRY.pack(problem, flags, predecessor or 0, initial, final))
+
+    try:
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    except (OSError, IOError):
+        return False
+
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(b"".join(chunks))
+        os.chmod(temporary, file_mode(path))
+        os.replace(temporary, path)
+    except (OSError, IOError):
+        os.unlink(temporary)
+        return False
+
+    return True
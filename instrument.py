@@ -0,0 +1,122 @@
+import cProfile
+import io
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Counters of the search and saturation hot paths, and wall time of the phases of commands, off by default.
+# A search asks for the counters of its kind once per call, and only counts if it gets some, so that turned off,
+# instrumentation costs a test per expanded node
+#
+# Counts of each kind of search:
+# expanded: nodes taken from the stack or queue and expanded
+# natural, user: successors generated by natural reductions and by user reductions
+# duplicates: successors that were already visited
+# passes: rounds of bitset passes over every reduction, for saturation
+# For saturation by bitset passes, natural and user count the problems added by the closures and by the passes of
+# user reductions, and duplicates the problems a pass derived again
+
+
+class Counters:
+    __slots__ = ["expanded", "natural", "user", "duplicates", "passes"]
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__slots__ if getattr(self, name)]
+
+
+class Stats:
+    def __init__(self):
+        self.enabled = False
+        self.kinds = {}
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def reset(self):
+        self.kinds = {}
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    # None when turned off
+    def counters(self, kind):
+        if not self.enabled:
+            return None
+
+        if kind not in self.kinds:
+            self.kinds[kind] = Counters()
+        return self.kinds[kind]
+
+    # Counts of every kind, as items of Counters, to be added to the stats of another process
+    def counts(self):
+        return {kind: counters.items() for kind, counters in self.kinds.items()}
+
+    def add(self, counts):
+        for kind, items in counts.items():
+            counters = self.counters(kind)
+            if counters is None:
+                return
+            for name, count in items:
+                setattr(counters, name, getattr(counters, name) + count)
+
+    # Does not time anything if name is None
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled or name is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    # Chains natural and user successors, counting them in counters
+    def successors(self, counters, natural, user):
+        for successor in natural:
+            counters.natural += 1
+            yield successor
+        for successor in user:
+            counters.user += 1
+            yield successor
+
+    def report(self):
+        lines = []
+        for kind, counters in sorted(self.kinds.items()):
+            counts = ", ".join(f"{name} {count}" for name, count in counters.items())
+            lines.append(f"{kind}: {counts or 'nothing counted'}")
+        for name, elapsed in sorted(self.times.items(), key=lambda item: -item[1]):
+            lines.append(f"{name}: {elapsed:.4f}s in {self.calls[name]} call{'s' if self.calls[name] > 1 else ''}")
+
+        return lines
+
+
+STATS = Stats()
+
+
+# Runs the code of the block under cProfile if path is set, and dumps the profile to path in pstats format
+@contextmanager
+def profiled(path):
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+# The functions taking the most cumulative time in a profile dump
+def profile_summary(path, count=15):
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(count)
+    return output.getvalue()
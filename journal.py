@@ -0,0 +1,95 @@
+import json
+import os
+import stat
+import tempfile
+
+# Append-only journal of a problem database. The first line is a snapshot of the whole database, in the format of
+# saved files, and every later line is one edit made since:
+# {"op": "tractable" or "intractable", "problem": "a b"}, {"op": "reduction", "initial": "a b", "final": "c"},
+# {"op": "saturate"}
+#
+# Each edit is flushed to disk as soon as it is made, at a cost independent of the size of the database. Once the
+# edits grow past COMPACT_RECORDS, the journal is compacted: the snapshot is rewritten with the current state, and
+# the edits are dropped. A line cut short by a crash is ignored when reading the journal back
+
+VERSION = 1
+COMPACT_RECORDS = 1000
+
+
+# Returns the snapshot and the list of edits of a journal, along with the length in bytes of the complete lines
+# read, or None if the content is not a journal
+def read_journal(content):
+    lines = content.split("\n")
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return None
+
+    if not isinstance(header, dict) or header.get("journal") != VERSION:
+        return None
+
+    records = []
+    length = len(lines[0].encode()) + 1
+    for line in lines[1:-1]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break
+        length += len(line.encode()) + 1
+
+    return header["snapshot"], records, length
+
+
+# Permissions of a file replacing the one at path: those of the previous file, or the ones open would give a new file.
+# Temporary files are only readable by their owner, so they get these before being moved over the previous file
+def file_mode(path):
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except (OSError, IOError):
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+# Written to a temporary file first, then moved over the previous journal, so that a crash leaves either of them
+def write_snapshot(path, snapshot):
+    try:
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    except (OSError, IOError):
+        return False
+
+    try:
+        with os.fdopen(descriptor, "w") as f:
+            f.write(json.dumps({"journal": VERSION, "snapshot": snapshot}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temporary, file_mode(path))
+        os.replace(temporary, path)
+    except (OSError, IOError):
+        os.unlink(temporary)
+        return False
+
+    return True
+
+
+class Journal:
+    # Appends to an existing journal, holding records edits after its snapshot in its first length bytes. Anything
+    # after them is the partial edit of a crash, and is dropped
+    def __init__(self, path, records=0, length=None):
+        self.path = path
+        self.records = records
+        if length is not None:
+            os.truncate(path, length)
+        self.file = open(path, "a")
+
+    def append(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records += 1
+
+    def needs_compaction(self):
+        return self.records >= COMPACT_RECORDS
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,495 @@
+class Lattice:
+    # Maps every parameter to a bit position, so that a problem (a set of parameters)
+    # can be handled as a plain integer mask
+    #
+    # With classes, a mapping from a representative parameter to the parameters it stands for, a bit stands for
+    # a whole class of interchangeable parameters: any of them maps to the bit of the class, and every member of
+    # the class is given back when converting the other way
+    def __init__(self, parameters, classes=None):
+        self.parameters = sorted(parameters)
+        self.size = len(self.parameters)
+        self.bits = {param: 1 << i for i, param in enumerate(self.parameters)}
+        self.full = (1 << self.size) - 1
+
+        self.classes = {param: [param] for param in self.parameters}
+        if classes is not None:
+            self.classes.update((param, sorted(members)) for param, members in classes.items())
+        for param, members in self.classes.items():
+            for member in members:
+                self.bits[member] = self.bits[param]
+
+        # Parameters absorbed by others, see restrict
+        self.absorbed = {}
+
+        # Bitsets over the whole lattice: bit m is set when problem m is in the set. They are only built when
+        # needed, as they take 2^n bits each
+        self._universe = None
+        self._layers = None
+        self._canonical = None
+
+    # Conversions, only used at the edges (CLI, files)
+    def to_mask(self, problem):
+        mask = 0
+        for param in problem:
+            mask |= self.bits[param]
+
+        return mask
+
+    def to_problem(self, mask):
+        return frozenset(member for i in bit_indices(mask) for member in self.classes[self.parameters[i]])
+
+    def prettyprint(self, mask):
+        content = ", ".join(sorted(self.to_problem(mask)))
+        return f"{{{content}}}"
+
+    def serialize(self, mask):
+        return " ".join(sorted(self.to_problem(mask)))
+
+    # With absorbed, a mapping from the bit of a parameter to the bits of the parameters it absorbs, any problem
+    # including the parameter is equivalent to the same problem with the parameters it absorbs. The canonical
+    # problems, which include every parameter absorbed by theirs, are closed under union and intersection, but
+    # they are not the subsets of fewer parameters: with f absorbing o, 3 of the 4 combinations of f and o remain
+    def restrict(self, absorbed):
+        self.absorbed = {bit: mask & ~bit for bit, mask in absorbed.items() if mask & ~bit}
+        self._canonical = None
+
+    # The largest problem equivalent to a problem
+    def canonical(self, mask):
+        for bit, absorbed in self.absorbed.items():
+            if mask & bit:
+                mask |= absorbed
+
+        return mask
+
+    # Every problem equivalent to a canonical problem: the parameters absorbed by others can be left out
+    def equivalents(self, mask):
+        free = 0
+        for bit, absorbed in self.absorbed.items():
+            if mask & bit:
+                free |= absorbed
+
+        subset = free
+        while True:
+            yield mask & ~subset
+            if subset == 0:
+                break
+            subset = (subset - 1) & free
+
+    # Lattice walks
+    def lower_covers(self, mask):
+        # Non-empty problems with exactly one parameter less
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            if mask != bit:
+                yield mask ^ bit
+            rest ^= bit
+
+    def upper_covers(self, mask):
+        # Problems with exactly one parameter more
+        rest = self.full & ~mask
+        while rest:
+            bit = rest & -rest
+            yield mask | bit
+            rest ^= bit
+
+    def powerset(self):
+        return range(1, self.full + 1)
+
+    # Bitset operations, each one a handful of passes over 2^n bits
+    @property
+    def universe(self):
+        if self._universe is None:
+            self._universe = ((1 << (1 << self.size)) - 1) & ~1
+
+        return self._universe
+
+    # The caches of a lattice are only set once complete, as lattices may be shared between threads
+    def layers(self):
+        # layers[i] holds every problem containing parameter i
+        if self._layers is None:
+            layers = []
+            length = 1 << self.size
+            for i in range(self.size):
+                period = 2 << i
+                pattern = ((1 << (1 << i)) - 1) << (1 << i)
+                while period < length:
+                    pattern |= pattern << period
+                    period <<= 1
+                layers.append(pattern)
+            self._layers = layers
+
+        return self._layers
+
+    def canonical_bitset(self):
+        if not self.absorbed:
+            return self.universe
+
+        if self._canonical is None:
+            bitset = self.universe
+            for bit, absorbed in self.absorbed.items():
+                bitset &= ~self.layers()[bit.bit_length() - 1] | self.supersets_bitset(absorbed)
+            self._canonical = bitset
+
+        return self._canonical
+
+    def to_bitset(self, problems):
+        bitset = 0
+        for mask in problems:
+            bitset |= 1 << mask
+
+        return bitset
+
+    def members(self, bitset):
+        digits = bin(bitset)[:1:-1]
+        position = digits.find("1")
+        while position != -1:
+            yield position
+            position = digits.find("1", position + 1)
+
+    def view(self, bitset):
+        # Bytes of a bitset, for membership tests that do not go through the whole integer
+        return bitset.to_bytes((1 << self.size) // 8 + 1, "little")
+
+    def supersets_bitset(self, mask):
+        bitset = self.universe
+        for i in bit_indices(mask):
+            bitset &= self.layers()[i]
+
+        return bitset
+
+    def disjoint_bitset(self, mask):
+        bitset = self.universe | 1
+        for i in bit_indices(mask):
+            bitset &= ~self.layers()[i]
+
+        return bitset
+
+    def up_closure(self, bitset):
+        # Superset-sum (zeta) transform: add every superset of every member
+        for i, layer in enumerate(self.layers()):
+            bitset |= (bitset & ~layer) << (1 << i)
+
+        return bitset & self.universe
+
+    def down_closure(self, bitset):
+        # Subset-sum (zeta) transform: add every non-empty subset of every member
+        for i, layer in enumerate(self.layers()):
+            bitset |= (bitset & layer) >> (1 << i)
+
+        return bitset & self.universe
+
+    def minimal_bitset(self, bitset):
+        # Members of the bitset with no lower cover in the bitset
+        covered = 0
+        for i, layer in enumerate(self.layers()):
+            covered |= (bitset & ~layer) << (1 << i)
+
+        return bitset & ~covered
+
+    def maximal_bitset(self, bitset):
+        # Members of the bitset with no upper cover in the bitset
+        covered = 0
+        for i, layer in enumerate(self.layers()):
+            covered |= (bitset & layer) >> (1 << i)
+
+        return bitset & ~covered
+
+    def _release(self, bitset, mask):
+        # Every problem obtained by removing any part of mask from a member
+        for i in bit_indices(mask):
+            bitset |= (bitset & self.layers()[i]) >> (1 << i)
+
+        return bitset
+
+    # The two passes below derive exactly what the user reduction initial > final derives when applied
+    # on every member of an up-closed (resp. down-closed) bitset
+
+    def tractable_pass(self, bitset, initial, final):
+        # Problems P containing initial and disjoint from final - initial, such that P | final is in the bitset
+        released = self._release(bitset & self.supersets_bitset(final), final)
+        return released & self.supersets_bitset(initial) & self.disjoint_bitset(final & ~initial)
+
+    def intractable_pass(self, bitset, initial, final):
+        # Problems P containing final, with P - final disjoint from initial, such that (P - final) | initial is
+        # in the bitset
+        released = self._release(bitset & self.supersets_bitset(initial), initial)
+        return ((released & self.disjoint_bitset(final | initial)) << final) & self.universe
+
+
+class SubsetIndex:
+    # Trie over the parameters of the stored masks, in increasing bit order. Finding every stored mask
+    # included in a problem only walks down the branches whose parameters all belong to the problem
+    def __init__(self, masks=()):
+        # Children are keyed by their bit; key 0 marks a node where a stored mask ends
+        self.root = {}
+        for mask in masks:
+            self.add(mask)
+
+    def add(self, mask):
+        node = self.root
+        for i in bit_indices(mask):
+            node = node.setdefault(1 << i, {})
+        node[0] = mask
+
+    def remove(self, mask):
+        bits = [1 << i for i in bit_indices(mask)]
+        path = [self.root]
+        for bit in bits:
+            path.append(path[-1][bit])
+        del path[-1][0]
+
+        # Prune the branches that do not lead to any stored mask anymore
+        while len(bits) > 0 and len(path[-1]) == 0:
+            path.pop()
+            del path[-1][bits.pop()]
+
+    def copy(self):
+        new = SubsetIndex()
+        stack = [(self.root, new.root)]
+        while stack:
+            node, copied = stack.pop()
+            for bit, child in node.items():
+                if bit == 0:
+                    copied[0] = child
+                else:
+                    copied[bit] = {}
+                    stack.append((child, copied[bit]))
+
+        return new
+
+    def subsets(self, problem):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for bit, child in node.items():
+                if bit == 0:
+                    yield child
+                elif bit & problem:
+                    stack.append(child)
+
+
+class Antichain:
+    # Problems of a set closed under supersets (or subsets if not minimal), stored as its minimal (resp. maximal)
+    # problems only. Every problem above (resp. below) an element is a member without being stored
+    def __init__(self, lattice, minimal=True, problems=()):
+        self.lattice = lattice
+        self.minimal = minimal
+        self.elements = {}
+
+        # Elements, to find the ones included in a problem, and complements of elements, to find the ones
+        # including a problem
+        self.below_index = SubsetIndex()
+        self.above_index = SubsetIndex()
+        self._bitset = None
+
+        for problem in problems:
+            self.add(problem)
+
+    def below(self, problem):
+        return self.below_index.subsets(problem)
+
+    def above(self, problem):
+        full = self.lattice.full
+        return (full & ~complement for complement in self.above_index.subsets(full & ~problem))
+
+    def __contains__(self, problem):
+        dominating = self.below(problem) if self.minimal else self.above(problem)
+        return next(dominating, None) is not None
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def add(self, problem):
+        if problem in self:
+            return False
+
+        for element in list(self.above(problem) if self.minimal else self.below(problem)):
+            self._discard(element)
+
+        self.elements[problem] = True
+        self.below_index.add(problem)
+        self.above_index.add(self.lattice.full & ~problem)
+        self._bitset = None
+        return True
+
+    # Copy sharing the lattice and the cached bitset
+    def copy(self):
+        new = Antichain(self.lattice, self.minimal)
+        new.elements = dict(self.elements)
+        new.below_index = self.below_index.copy()
+        new.above_index = self.above_index.copy()
+        new._bitset = self._bitset
+        return new
+
+    def _discard(self, element):
+        del self.elements[element]
+        self.below_index.remove(element)
+        self.above_index.remove(self.lattice.full & ~element)
+
+    # Every member, as a bitset over the lattice. Computed once between two additions
+    def bitset(self):
+        if self._bitset is None:
+            elements = self.lattice.to_bitset(self.elements)
+            if self.minimal:
+                self._bitset = self.lattice.up_closure(elements)
+            else:
+                self._bitset = self.lattice.down_closure(elements)
+
+        return self._bitset
+
+    # Replace the content by a closed bitset, of which only the boundary is stored
+    def set_bitset(self, bitset):
+        if self.minimal:
+            boundary = self.lattice.minimal_bitset(bitset)
+        else:
+            boundary = self.lattice.maximal_bitset(bitset)
+
+        self.elements = {}
+        self.below_index = SubsetIndex()
+        self.above_index = SubsetIndex()
+        for element in self.lattice.members(boundary):
+            self.elements[element] = True
+            self.below_index.add(element)
+            self.above_index.add(self.lattice.full & ~element)
+        self._bitset = bitset
+
+
+# For every node, the bitset (over node indices) of the nodes reachable from it in at least one step
+def reachability(nodes, successors, counters=None):
+    return merge_reachability(condensation(adjacency(nodes, successors, counters=counters)))
+
+
+# Successors of the nodes of indices in [low, high), as lists of indices among the nodes, without repetitions.
+# Successors that are not nodes are left out. With counters, see instrument.py, the nodes are counted as expanded,
+# and the repeated successors as duplicates
+def adjacency(nodes, successors, low=0, high=None, counters=None):
+    if high is None:
+        high = len(nodes)
+
+    index_of = {node: i for i, node in enumerate(nodes)}
+    lists = []
+    for node in nodes[low:high]:
+        indices = [index_of[succ] for succ in successors(node) if succ in index_of]
+        lists.append(list(dict.fromkeys(indices)))
+        if counters is not None:
+            counters.expanded += 1
+            counters.duplicates += len(indices) - len(lists[-1])
+
+    return lists
+
+
+# Strongly connected components of a graph given by its adjacency lists, found with an iterative Tarjan, which
+# emits them in reverse topological order. Returns flat lists of integers, so that they can be shared between
+# processes as they are: the component of every node, the members of every component (members[member_starts[c]:
+# member_starts[c + 1]]), the successors of every component outside of it (exits, likewise), and whether every
+# component has a cycle (1) or not (0)
+def condensation(adjacency):
+    count = len(adjacency)
+    order = [-1] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    component_of = [-1] * count
+    member_starts, members, exit_starts, exits, cyclic = [0], [], [0], [], []
+    stack = []
+    counter = 0
+
+    for root in range(count):
+        if order[root] != -1:
+            continue
+
+        order[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            v, i = work[-1]
+            if i < len(adjacency[v]):
+                work[-1] = (v, i + 1)
+                w = adjacency[v][i]
+                if order[w] == -1:
+                    order[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    lowlink[v] = min(lowlink[v], order[w])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[v])
+
+            if lowlink[v] == order[v]:
+                component = len(cyclic)
+                start = len(members)
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component_of[w] = component
+                    members.append(w)
+                    if w == v:
+                        break
+
+                outside = {}
+                has_cycle = len(members) - start > 1
+                for w in members[start:]:
+                    for succ in adjacency[w]:
+                        if component_of[succ] != component:
+                            outside[succ] = True
+                        else:
+                            has_cycle = True
+                exits.extend(outside)
+                member_starts.append(len(members))
+                exit_starts.append(len(exits))
+                cyclic.append(int(has_cycle))
+
+    return component_of, member_starts, members, exit_starts, exits, cyclic
+
+
+# Reachability of every node from the condensation of the graph. Components come in reverse topological order, so
+# that every component merges the reachability of its successors in a single pass. Only the nodes of indices in
+# [low, high) are kept in the bitsets, shifted by low, so that the merge can be split between processes
+def merge_reachability(condensation, low=0, high=None):
+    component_of, member_starts, members, exit_starts, exits, cyclic = condensation
+    if high is None:
+        high = len(component_of)
+
+    def bit(i):
+        return 1 << (i - low) if low <= i < high else 0
+
+    component_reach = []
+    for component in range(len(cyclic)):
+        reach = 0
+        for succ in exits[exit_starts[component]:exit_starts[component + 1]]:
+            reach |= component_reach[component_of[succ]] | bit(succ)
+        if cyclic[component]:
+            for w in members[member_starts[component]:member_starts[component + 1]]:
+                reach |= bit(w)
+        component_reach.append(reach)
+
+    return [component_reach[component] for component in component_of]
+
+
+def in_view(view, mask):
+    return view[mask >> 3] >> (mask & 7) & 1
+
+
+def bit_indices(mask):
+    i = 0
+    while mask:
+        if mask & 1:
+            yield i
+        mask >>= 1
+        i += 1
+
+
+def popcount(mask):
+    return bin(mask).count("1")
@@ -0,0 +1,169 @@
+import array
+import functools
+import multiprocessing
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+from instrument import STATS
+from lattice import adjacency, condensation, merge_reachability
+
+# Process pool helpers. Workers receive the parameters and the reductions once, when they start, and read the
+# lattice bitsets, and the graphs built for impacts, from shared memory blocks instead of having them pickled with
+# every task. What workers count, see instrument.py, is sent back with the results of their tasks and added to the
+# counters of the parent process
+
+_worker = {}
+
+
+class SharedBitsets:
+    # Bitsets over the lattice, laid out one after the other in a shared memory block
+    def __init__(self, bitsets, lattice):
+        self.length = (1 << lattice.size) // 8 + 1
+        self.count = len(bitsets)
+        self.memory = shared_memory.SharedMemory(create=True, size=self.length * self.count)
+        for i, bitset in enumerate(bitsets):
+            self.memory.buf[i * self.length:(i + 1) * self.length] = bitset.to_bytes(self.length, "little")
+
+    def handle(self):
+        return self.memory.name, self.length, self.count
+
+    def release(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedArrays:
+    # Lists of integers, laid out one after the other in a shared memory block as 64-bit integers
+    def __init__(self, arrays):
+        self.lengths = [len(values) for values in arrays]
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, 8 * sum(self.lengths)))
+        offset = 0
+        for values in arrays:
+            data = array.array("q", values).tobytes()
+            self.memory.buf[offset:offset + len(data)] = data
+            offset += len(data)
+
+    def handle(self):
+        return self.memory.name, self.lengths
+
+    def release(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def read_arrays(name, lengths):
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = []
+        offset = 0
+        for length in lengths:
+            values = array.array("q")
+            values.frombytes(memory.buf[offset:offset + 8 * length])
+            arrays.append(values.tolist())
+            offset += 8 * length
+        return arrays
+    finally:
+        memory.close()
+
+
+def read_bitsets(name, length, count):
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        return [int.from_bytes(memory.buf[i * length:(i + 1) * length], "little") for i in range(count)]
+    finally:
+        memory.close()
+
+
+def _init_worker(problem, handle, counting):
+    _worker["problem"] = problem
+    _worker["bitsets"] = read_bitsets(*handle)
+    STATS.enabled = counting
+
+
+def _counted(task, arguments):
+    STATS.reset()
+    result = task(arguments)
+    return result, STATS.counts()
+
+
+def _map(pool, task, arguments):
+    results = []
+    for result, counts in pool.map(functools.partial(_counted, task), arguments):
+        STATS.add(counts)
+        results.append(result)
+
+    return results
+
+
+@contextmanager
+def _pool(problem, bitsets, workers):
+    shared = SharedBitsets(bitsets, problem.lattice)
+    try:
+        with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                  initargs=(problem, shared.handle(), STATS.enabled)) as pool:
+            yield pool
+    finally:
+        shared.release()
+
+
+# Saturation: one closure per direction, given as (tractability, known problems bitset). There are only two of
+# them, so saturation uses at most two processes
+def _closure_task(arguments):
+    index, tractability = arguments
+    return _worker["problem"]._bitset_closure(tractability, _worker["bitsets"][index])
+
+
+def closures(problem, directions, workers):
+    arguments = [(index, tractability) for index, (tractability, _) in enumerate(directions)]
+    with _pool(problem, [bitset for _, bitset in directions], min(workers, 2)) as pool:
+        return _map(pool, _closure_task, arguments)
+
+
+# Impact: reachability over the open problems, in each direction. Workers first build the adjacency lists of ranges
+# of source problems. The components of each graph are then found once, and shared with the workers, which each
+# merge the reachability towards a range of target problems
+def _adjacency_task(arguments):
+    index, low, high = arguments
+    problem = _worker["problem"]
+    if "nodes" not in _worker:
+        _worker["nodes"] = list(problem.lattice.members(_worker["bitsets"][0]))
+
+    counters = STATS.counters("reachability")
+    return adjacency(_worker["nodes"], lambda node: problem._impact_successors(node, index == 1, counters), low, high,
+                     counters)
+
+
+def _merge_task(arguments):
+    handle, index, low, high = arguments
+    if "condensations" not in _worker:
+        arrays = read_arrays(*handle)
+        _worker["condensations"] = [arrays[:6], arrays[6:]]
+
+    return merge_reachability(_worker["condensations"][index], low, high)
+
+
+def reachabilities(problem, nodes, workers):
+    step = len(nodes) // workers + 1
+    ranges = [(low, min(low + step, len(nodes))) for low in range(0, len(nodes), step)]
+    arguments = [(index, low, high) for index in [0, 1] for low, high in ranges]
+
+    with _pool(problem, [problem.lattice.to_bitset(nodes)], workers) as pool:
+        lists = [[], []]
+        for (index, _, _), partial in zip(arguments, _map(pool, _adjacency_task, arguments)):
+            lists[index].extend(partial)
+        condensations = [condensation(adjacency_lists) for adjacency_lists in lists]
+
+        shared = SharedArrays(condensations[0] + condensations[1])
+        try:
+            results = _map(pool, _merge_task, [(shared.handle(), index, low, high) for index, low, high in arguments])
+        finally:
+            shared.release()
+
+    # Tractable then intractable reachability, the partial bitsets being merged in task order
+    merged = [[0] * len(nodes), [0] * len(nodes)]
+    for (index, low, _), partial in zip(arguments, results):
+        reach = merged[index]
+        for i, partial_reach in enumerate(partial):
+            reach[i] |= partial_reach << low
+
+    return merged
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Long-running query server over one loaded and saturated problem. Clients connect to a local TCP port or Unix
+# socket, and send one query per line, in the syntax of batch mode. Each query is answered with one JSON object
+# per line, as batch mode does with --json
+#
+# Queries are answered against a snapshot of the problem that is never modified once published, so that any
+# number of them run at the same time, on a pool of threads. Writes are applied one at a time to a copy of the
+# latest snapshot, which is then published for the queries that come after them. The copy only duplicates what
+# the write may modify, see ParameterizedProblem.write_copy, and its caches are built before it is published
+
+
+# Host and port of an address "[host:]port", the port being made of digits only. Any other address is the path of a
+# Unix socket, and gives None
+def tcp_address(address):
+    host, _, port = address.rpartition(":")
+    if not port.isdigit() or "/" in host:
+        return None
+
+    return host or "127.0.0.1", int(port)
+
+
+class Server:
+    # query(problem, command) answers a query as a dict, and modifies the problem for the commands in writes
+    def __init__(self, problem, query, writes, threads=4):
+        problem.build_caches()
+        self.snapshot = problem
+        self.query = query
+        self.writes = set(writes)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.write_lock = None
+
+    async def run(self, address, verbose=True):
+        self.write_lock = asyncio.Lock()
+        if tcp_address(address) is None:
+            server = await asyncio.start_unix_server(self.handle, path=address)
+        else:
+            host, port = tcp_address(address)
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+
+        if verbose:
+            print(f"Serving {self.snapshot.name} on {address}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                command = line.decode(errors="replace").split()
+                if len(command) == 0 or command[0].startswith("#"):
+                    continue
+
+                result = await self.answer(command)
+                writer.write((json.dumps(result) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, command):
+        start = time.perf_counter()
+        result = {"query": " ".join(command)}
+        loop = asyncio.get_running_loop()
+
+        try:
+            if command[0] in self.writes:
+                async with self.write_lock:
+                    self.snapshot, answer = await loop.run_in_executor(self.executor, self._write,
+                                                                       self.snapshot, command)
+            else:
+                answer = await loop.run_in_executor(self.executor, self.query, self.snapshot, command)
+        except Exception as e:
+            answer = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+        result.update(answer)
+        result["time"] = time.perf_counter() - start
+        return result
+
+    # Runs the write on a copy of the current snapshot, which goes on answering queries meanwhile. The journal of
+    # the problem, if any, follows the latest snapshot
+    def _write(self, current, command):
+        log, current.journal = current.journal, None
+        try:
+            problem = current.write_copy()
+            problem.journal = log
+            answer = self.query(problem, command)
+            problem.build_caches()
+        except BaseException:
+            current.journal = log
+            raise
+
+        return problem, answer
+
+
+def serve(problem, address, query, writes, threads=4, verbose=True):
+    server = Server(problem, query, writes, threads=threads)
+    try:
+        asyncio.run(server.run(address, verbose=verbose))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(wait=False)
+        if tcp_address(address) is None and os.path.exists(address):
+            os.unlink(address)
@@ -1,16 +1,22 @@
 import argparse
+import copy
+import heapq
 import itertools
 import json
+import os
+import sys
+import time
 from enum import Enum
-from collections import deque
+from collections import deque, namedtuple
 
-VERSION = "0.0.1"
-
-parser = argparse.ArgumentParser(description='Parameterized complexity')
-parser.add_argument('-f', dest='filename', action='store', default=None,
-                    help='the path of the file to open')
+import cache
+import instrument
+import journal
+from instrument import STATS
+from lattice import Antichain, Lattice, SubsetIndex, in_view, popcount, reachability
+from store import CONFLICT, UNKNOWN, LatticeStore
 
-args = parser.parse_args()
+VERSION = "0.0.1"
 
 
 class Tractability(Enum):
@@ -18,18 +24,167 @@ class Tractability(Enum):
     TRACTABLE = "tractable"
 
 
+# Results of the programmatic API. Problems are frozensets of parameters
+# proof: problems from the given one to a known one (resp. from a known one to the given one), or None if unsolved
+SolveResult = namedtuple("SolveResult", ["problem", "tractability", "proof", "expanded"])
+# tractable, intractable: open problems that would be solved if the problem were tractable (resp. intractable)
+ImpactResult = namedtuple("ImpactResult", ["problem", "tractable", "intractable"])
+# tractable, intractable: number of open problems newly solved by this step if the problem is tractable (resp.
+# intractable), itself included
+PlanStep = namedtuple("PlanStep", ["problem", "tractable", "intractable"])
+# tractable_proof, intractable_proof: shortest proofs of both tractabilities of a problem
+Conflict = namedtuple("Conflict", ["problem", "tractable_proof", "intractable_proof"])
+# tractable, intractable: number of problems added to the database, that is, members of its closure that were
+# neither registered nor found by an earlier saturation
+SaturationResult = namedtuple("SaturationResult", ["tractable", "intractable"])
+# classes: sets of interchangeable parameters merged by the collapse. dominated: (parameters, absorbing) pairs, the
+# parameters being absorbed by any of the absorbing ones without absorbing them back. Open problems are then
+# restricted to the problems including the parameters absorbed by theirs
+CollapseResult = namedtuple("CollapseResult", ["classes", "dominated"])
+# Reductions removed by the compilation, as (initial, final) problem pairs. natural: reductions that follow from
+# natural reductions alone. subsumed: (reduction, reductions it follows from) pairs
+CompileResult = namedtuple("CompileResult", ["duplicates", "natural", "subsumed"])
+
+
+class ProofStore:
+    # How the known problems of one tractability were obtained: problem -> (predecessor, rule, order), the rule
+    # being the (initial, final) problems of the user reduction used. Registered problems have no predecessor
+    # and no rule. Any other known problem follows by natural reduction from a recorded one below it (resp.
+    # above it if not minimal); following the one recorded first keeps proofs from looping
+    def __init__(self, lattice, minimal=True):
+        self.lattice = lattice
+        self.minimal = minimal
+        self.entries = {}
+        self.index = SubsetIndex()
+
+        # Store whose entries come before these ones, shared with copies and never modified, see copy
+        self.base = None
+
+    def __contains__(self, problem):
+        return self._entry(problem) is not None
+
+    def __len__(self):
+        return len(self.entries) + (len(self.base.entries) if self.base is not None else 0)
+
+    def _entry(self, problem):
+        entry = self.entries.get(problem)
+        if entry is None and self.base is not None:
+            entry = self.base.entries.get(problem)
+
+        return entry
+
+    def record(self, problem, predecessor=None, rule=None):
+        if problem in self:
+            return
+
+        self.entries[problem] = (predecessor, rule, len(self))
+        self.index.add(problem if self.minimal else self.lattice.full & ~problem)
+
+    # Every entry, as (problem, (predecessor, rule, order)) in the order they were recorded
+    def items(self):
+        if self.base is None:
+            return self.entries.items()
+
+        return itertools.chain(self.base.entries.items(), self.entries.items())
+
+    def registered(self):
+        return [problem for problem, (predecessor, _, _) in self.items() if predecessor is None]
+
+    def natural_source(self, problem):
+        full = self.lattice.full
+        indexes = [self.index] if self.base is None else [self.index, self.base.index]
+        if self.minimal:
+            candidates = itertools.chain.from_iterable(index.subsets(problem) for index in indexes)
+        else:
+            candidates = (full & ~complement
+                          for index in indexes for complement in index.subsets(full & ~problem))
+
+        return min(candidates, key=lambda candidate: self._entry(candidate)[2], default=None)
+
+    # Problems from the given one back to a registered problem
+    def proof(self, problem):
+        proof = [problem]
+        while True:
+            entry = self._entry(problem)
+            if entry is not None:
+                problem = entry[0]
+            else:
+                problem = self.natural_source(problem)
+
+            if problem is None:
+                return proof
+            proof.append(problem)
+
+    # Copy to record further entries in, after which this store must not be modified anymore: its entries are
+    # shared rather than copied. Only the entries recorded on top of a shared base are copied, and once they grow
+    # past an eighth of it they are merged with it into a new base, so that copies stay cheap on average
+    def copy(self):
+        new = ProofStore(self.lattice, self.minimal)
+        if self.base is None:
+            new.base = self
+        elif len(self.entries) <= max(1024, len(self.base.entries) // 8):
+            new.base = self.base
+            new.entries = dict(self.entries)
+            new.index = self.index.copy()
+        else:
+            base = ProofStore(self.lattice, self.minimal)
+            base.entries = dict(self.base.entries)
+            base.entries.update(self.entries)
+            base.index = self.base.index.copy()
+            for problem in self.entries:
+                base.index.add(problem if self.minimal else self.lattice.full & ~problem)
+            new.base = base
+
+        return new
+
+
 class ParameterizedProblem:
-    def __init__(self):
+    # With a store path, saturation results are kept in a memory-mapped LatticeStore at this path instead of in
+    # memory, for classes with too many parameters for whole-lattice bitsets
+    def __init__(self, store_path=None):
         self.name = ""
-        self.parameters = frozenset([])
+
+        # Problems are stored as bitmasks over self.lattice
         self.reductions = {}
         self.antireductions = {}
-        self.tractable = {}
-        self.intractable = {}
+        self.store_path = store_path
+        self.store = None
+        self.set_parameters([])
+
+        # Indexes over the keys of self.reductions and self.antireductions
+        self.reductions_index = SubsetIndex()
+        self.antireductions_index = SubsetIndex()
+
+        # Whether every deducible problem is registered. Once saturated, every addition is propagated
+        # incrementally so that the database stays saturated
+        self.saturated = False
+
+        # Journal the edits are appended to, if any
+        self.journal = None
 
         # Session variables
         self.registered_impacts = []
 
+    # With classes, see Lattice, only the representatives of the classes are parameters of the lattice
+    def set_parameters(self, parameters, classes=None):
+        self.parameters = frozenset(parameters)
+        merged = set()
+        for representative, members in (classes or {}).items():
+            merged.update(member for member in members if member != representative)
+        self.lattice = Lattice(self.parameters - merged, classes)
+
+        # Known problems are stored as their minimal tractable and maximal intractable problems
+        self.tractable = Antichain(self.lattice, minimal=True)
+        self.intractable = Antichain(self.lattice, minimal=False)
+        self.tractable_proofs = ProofStore(self.lattice, minimal=True)
+        self.intractable_proofs = ProofStore(self.lattice, minimal=False)
+
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self.store_path is not None and len(self.parameters) > 0:
+            self.store = LatticeStore(self.store_path, self.lattice.size)
+
     def manual_initialization(self, guided):
         print("Name of the problem:")
         if guided:
@@ -39,21 +194,21 @@ class ParameterizedProblem:
         print("Parameters:")
         if guided:
             print("Example: a b c d e")
-        self.parameters = frozenset(prompt().split())
+        self.set_parameters(prompt().split())
 
         print("Known tractable problems:")
         if guided:
             print("Example: a b c d e")
             print("-1 to stop")
 
-        self.add_problem(self.tractable, loop=True)
+        self.add_problem(Tractability.TRACTABLE, loop=True)
 
         print("Known intractable problems:")
         if guided:
             print("Example: a b c d e")
             print("-1 to stop")
 
-        self.add_problem(self.intractable, loop=True)
+        self.add_problem(Tractability.INTRACTABLE, loop=True)
 
         print("Known FPT-reductions:")
         if guided:
@@ -64,8 +219,129 @@ class ParameterizedProblem:
 
         print("Done initializing")
 
+    # Programmatic API: nothing is printed or prompted, unknown parameters raise a ValueError, and the database is
+    # saturated silently when a result depends on it
+    def register_problem(self, problem, tractability):
+        newly_found = self._register_problem(self._parameters_mask(problem), tractability)
+        return self._decode_found(newly_found)
+
+    def register_reduction(self, initial_problem, final_problem):
+        newly_found = self._add_reduction(self._parameters_mask(initial_problem),
+                                          self._parameters_mask(final_problem))
+        return self._decode_found(newly_found)
+
+    def solve_result(self, problem, tractability, shortest=False):
+        mask = self._parameters_mask(problem)
+        proof, expanded = self.find_proof(mask, tractability, shortest=shortest)
+        if proof is not None:
+            proof = [self.lattice.to_problem(step) for step in self._compact_proof(proof)]
+
+        return SolveResult(self.lattice.to_problem(mask), tractability, proof, expanded)
+
+    def impact_result(self, problem, workers=1):
+        mask = self._parameters_mask(problem)
+        if not self.saturated:
+            self.saturate_result(workers=workers)
+
+        newly_solved = self.impact(mask)
+        return ImpactResult(self.lattice.to_problem(mask),
+                            [self.lattice.to_problem(p) for p in newly_solved["tractable"]],
+                            [self.lattice.to_problem(p) for p in newly_solved["intractable"]])
+
+    # Takes the same selection arguments as _select_open. Without impact, the problems are decoded as they are
+    # iterated over
+    def open_problems_result(self, impact=False, workers=1, **selection):
+        if not self.saturated:
+            self.saturate_result(workers=workers)
+
+        selected = self._select_open(**selection)
+        if not impact:
+            return (self.lattice.to_problem(p) for p in selected)
+
+        # Impacts count every open problem, selected or not
+        currently_open_problems = list(self._open_problems())
+        index_of = {problem: i for i, problem in enumerate(currently_open_problems)}
+        tractable_reach, intractable_reach = self._impact_bitsets(currently_open_problems, workers=workers)
+        return [ImpactResult(self.lattice.to_problem(problem),
+                             [self.lattice.to_problem(currently_open_problems[j])
+                              for j in self.lattice.members(tractable_reach[index_of[problem]])],
+                             [self.lattice.to_problem(currently_open_problems[j])
+                              for j in self.lattice.members(intractable_reach[index_of[problem]])])
+                for problem in selected]
+
+    def check_result(self, workers=1):
+        if not self.saturated:
+            self.saturate_result(workers=workers)
+
+        return [Conflict(self.lattice.to_problem(problem),
+                         [self.lattice.to_problem(step) for step in self._compact_proof(tractable_proof)],
+                         [self.lattice.to_problem(step) for step in self._compact_proof(intractable_proof)])
+                for problem, tractable_proof, intractable_proof in self._check()]
+
+    def plan_result(self, k, workers=1):
+        if not self.saturated:
+            self.saturate_result(workers=workers)
+
+        return [PlanStep(self.lattice.to_problem(problem), tractable_gain, intractable_gain)
+                for problem, tractable_gain, intractable_gain in self._plan(k, workers=workers)]
+
+    def saturate_result(self, method="bitset", workers=1):
+        if self.store is not None:
+            counts = self._saturate_store()
+            return SaturationResult(counts["tractable"], counts["intractable"])
+
+        newly_found = self._saturate(method=method, workers=workers)
+        return SaturationResult(popcount(newly_found["tractable"]), popcount(newly_found["intractable"]))
+
+    def collapse_result(self):
+        closures = self._absorptions()
+        lattice = self.lattice
+
+        classes = []
+        for bit, closure in closures.items():
+            if any(bit & parameter_class for parameter_class in classes):
+                continue
+            classes.append(sum(other for other in closures if closure & other and closures[other] & bit))
+
+        dominated = []
+        for parameter_class in classes:
+            absorbing = sum(other for other in closures if closures[other] & parameter_class and other & ~parameter_class)
+            if absorbing:
+                dominated.append((lattice.to_problem(parameter_class), lattice.to_problem(absorbing)))
+
+        merged = [lattice.to_problem(parameter_class) for parameter_class in classes if popcount(parameter_class) > 1]
+        if merged:
+            self._collapse(classes)
+            closures = self._absorptions()
+        self.lattice.restrict(closures)
+        self.registered_impacts = []
+
+        return CollapseResult(merged, dominated)
+
+    def compile_result(self):
+        pruned = self._compile()
+
+        def decode(rule):
+            return self.lattice.to_problem(rule[0]), self.lattice.to_problem(rule[1])
+
+        return CompileResult([decode(rule) for rule in pruned["duplicates"]],
+                             [decode(rule) for rule in pruned["natural"]],
+                             [(decode(rule), [decode(other) for other in others])
+                              for rule, others in pruned["subsumed"]])
+
+    def _parameters_mask(self, problem):
+        for param in problem:
+            if param not in self.lattice.bits:
+                raise ValueError(f"Unknown parameter {param}")
+
+        return self.lattice.to_mask(problem)
+
+    def _decode_found(self, newly_found):
+        return {tractability: [self.lattice.to_problem(p) for p in problems]
+                for tractability, problems in newly_found.items()}
+
     # Interaction functions
-    def add_problem(self, tract_class, loop=False):
+    def add_problem(self, tractability, loop=False):
         while True:
             line = prompt()
             if line == "-1":
@@ -75,15 +351,11 @@ class ParameterizedProblem:
             if not self.check_parameters_validity(problem):
                 continue
 
-            if tract_class == Tractability.TRACTABLE:
-                tract_class = self.tractable
-            elif tract_class == Tractability.INTRACTABLE:
-                tract_class = self.intractable
-
-            tract_class[problem] = True
+            newly_found = self._register_problem(self.lattice.to_mask(problem), tractability)
 
             if not loop:
                 print("Successfully added problem tractability")
+                self._print_deduced(newly_found)
                 break
 
     def add_reduction(self, loop=False):
@@ -105,79 +377,209 @@ class ParameterizedProblem:
             if not correct:
                 continue
 
-            self._add_reduction(reduction[0], reduction[1])
+            newly_found = self._add_reduction(self.lattice.to_mask(reduction[0]), self.lattice.to_mask(reduction[1]))
 
             if not loop:
                 print("Successfully added reduction")
+                self._print_deduced(newly_found)
                 break
 
     def _add_reduction(self, initial_problem, final_problem):
+        # A reduction entered twice brings nothing new
+        if final_problem in self.reductions.get(initial_problem, []):
+            return {"tractable": [], "intractable": []}
+
         if initial_problem not in self.reductions:
             self.reductions[initial_problem] = [final_problem]
+            self.reductions_index.add(initial_problem)
         else:
             self.reductions[initial_problem].append(final_problem)
 
         if final_problem not in self.antireductions:
             self.antireductions[final_problem] = [initial_problem]
+            self.antireductions_index.add(final_problem)
         else:
             self.antireductions[final_problem].append(initial_problem)
 
-    # Problem-solving and search functions
-    def get_natural_reductions(self, problem):
-        reduced_problems = []
-        for n in range(len(problem)-1, 0, -1): #len(problem)-1 ?
-            problems_n = list(map(frozenset, itertools.combinations(problem, n)))
-            reduced_problems.extend(problems_n)
+        # The store is only saturated as a whole
+        if self.store is not None:
+            self.saturated = False
 
-        return reduced_problems
+        newly_found = {"tractable": [], "intractable": []}
+        if self.saturated:
+            newly_found = self._apply_reduction(initial_problem, final_problem)
 
-    def get_natural_antireductions(self, problem):
-        reduced_problems = []
-        complement = frozenset(self.parameters.difference(problem))
+        # Journaled once applied, as journaling may compact the journal into a snapshot of the current state
+        self._journal({"op": "reduction", "initial": self.lattice.serialize(initial_problem),
+                       "final": self.lattice.serialize(final_problem)})
+        return newly_found
 
-        for n in range(1, len(complement)):
-            problems_n = list(map(lambda s: frozenset(s).union(problem), itertools.combinations(complement, n)))
-            reduced_problems.extend(problems_n)
+    # Apply a new reduction on every known problem it matches, then propagate from the new problems
+    def _apply_reduction(self, initial_problem, final_problem):
+        newly_found = {}
+        lattice = self.lattice
+        for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
+            status = self._known(tractability).bitset()
+            if tractability == Tractability.TRACTABLE:
+                new = lattice.tractable_pass(status, initial_problem, final_problem) & ~status
+                seeds = list(lattice.members(lattice.minimal_bitset(new)))
+                predecessors = [problem | final_problem for problem in seeds]
+            else:
+                new = lattice.intractable_pass(status, initial_problem, final_problem) & ~status
+                seeds = list(lattice.members(lattice.maximal_bitset(new)))
+                predecessors = [(problem & ~final_problem) | initial_problem for problem in seeds]
 
-        return reduced_problems
+            proofs = self._proofs(tractability)
+            for problem, predecessor in zip(seeds, predecessors):
+                proofs.record(problem, predecessor, (initial_problem, final_problem))
 
-    def get_user_reductions(self, problem):
-        reduced_problems = []
-        for candidate, possible_reductions in self.reductions.items():
-            if candidate.issubset(problem):
-                base_problem = problem.difference(candidate)
-                for new_parameters in possible_reductions:
-                    new_problem = base_problem.union(new_parameters)
-                    reduced_problems.append(new_problem)
+            newly_found[tractability.value] = seeds + self._propagate(tractability, seeds)
 
-        return reduced_problems
+        return newly_found
 
-    def get_user_antireductions(self, problem):
-        reduced_problems = []
-        for candidate, possible_antireductions in self.antireductions.items():
-            if candidate.issubset(problem):
-                base_problem = problem.difference(candidate)
-                for new_parameters in possible_antireductions:
-                    new_problem = base_problem.union(new_parameters)
-                    reduced_problems.append(new_problem)
+    # Register a problem of known tractability, keeping the database saturated if it was
+    def _register_problem(self, problem, tractability):
+        known = self._known(tractability)
+        newly_found = {"tractable": [], "intractable": []}
+        if problem in known:
+            return newly_found
+
+        self._proofs(tractability).record(problem)
+        if self.store is not None:
+            self.saturated = False
+
+        if self.saturated:
+            newly_found[tractability.value] = self._propagate(tractability, [problem])
+        else:
+            known.add(problem)
+
+        self._journal({"op": tractability.value, "problem": self.lattice.serialize(problem)})
+        return newly_found
+
+    def _print_deduced(self, newly_found):
+        for tractability in ["tractable", "intractable"]:
+            if len(newly_found[tractability]) > 0:
+                print(f"Deduced {len(newly_found[tractability])} new {tractability} problems")
 
-        return reduced_problems
+    def _index_reductions(self):
+        self.reductions_index = SubsetIndex(self.reductions.keys())
+        self.antireductions_index = SubsetIndex(self.antireductions.keys())
 
-    def solve(self, problem, tractability):
+    # Problem-solving and search functions
+    # Successors are generated lazily. Natural reductions only go to the immediate neighbours, the other
+    # subsets and supersets being reached by transitivity
+    def get_natural_reductions(self, problem):
+        return self.lattice.lower_covers(problem)
+
+    def get_natural_antireductions(self, problem):
+        return self.lattice.upper_covers(problem)
+
+    def get_user_reductions(self, problem):
+        for candidate in self.reductions_index.subsets(problem):
+            base_problem = problem & ~candidate
+            for new_parameters in self.reductions[candidate]:
+                yield base_problem | new_parameters
+
+    def get_user_antireductions(self, problem):
+        for candidate in self.antireductions_index.subsets(problem):
+            base_problem = problem & ~candidate
+            for new_parameters in self.antireductions[candidate]:
+                yield base_problem | new_parameters
+
+    def get_reductions(self, problem):
+        return itertools.chain(self.get_natural_reductions(problem), self.get_user_reductions(problem))
+
+    def get_antireductions(self, problem):
+        return itertools.chain(self.get_natural_antireductions(problem), self.get_user_antireductions(problem))
+
+    # Reductions of a problem (antireductions unless reductions), counted in counters if any
+    def _successors(self, problem, reductions, counters):
+        if counters is None:
+            return self.get_reductions(problem) if reductions else self.get_antireductions(problem)
+        elif reductions:
+            return STATS.successors(counters, self.get_natural_reductions(problem), self.get_user_reductions(problem))
+        else:
+            return STATS.successors(counters, self.get_natural_antireductions(problem),
+                                    self.get_user_antireductions(problem))
+
+    # Successors of a problem for impacts. Once the lattice is restricted, see collapse, impacts only go through
+    # canonical problems: the successors of one are those of all the problems equivalent to it, made canonical
+    def _impact_successors(self, problem, reductions, counters=None):
+        lattice = self.lattice
+        if not lattice.absorbed:
+            return self._successors(problem, reductions, counters)
+
+        return (lattice.canonical(succ) for equivalent in lattice.equivalents(problem)
+                for succ in self._successors(equivalent, reductions, counters))
+
+    # Problems of the given tractability that can be deduced from a problem in one step, along with the rule used
+    def get_derivations(self, problem, tractability):
+        if tractability == Tractability.TRACTABLE:
+            for new_problem in self.get_natural_antireductions(problem):
+                yield new_problem, None
+            for candidate in self.antireductions_index.subsets(problem):
+                base_problem = problem & ~candidate
+                for new_parameters in self.antireductions[candidate]:
+                    yield base_problem | new_parameters, (new_parameters, candidate)
+        else:
+            for new_problem in self.get_natural_reductions(problem):
+                yield new_problem, None
+            for candidate in self.reductions_index.subsets(problem):
+                base_problem = problem & ~candidate
+                for new_parameters in self.reductions[candidate]:
+                    yield base_problem | new_parameters, (candidate, new_parameters)
+
+    def solve(self, problem, tractability, shortest=False):
         if not self.check_parameters_validity(problem):
             return
 
+        problem = self.lattice.to_mask(problem)
+
+        proof, expanded = self.find_proof(problem, tractability, shortest=shortest)
+        if shortest:
+            print(f"Expanded {expanded} nodes")
+        if proof is None:
+            print("No solution found")
+            return
+
+        self._print_proof(proof)
+
+        if tractability == Tractability.INTRACTABLE and problem not in self.intractable or \
+           tractability == Tractability.TRACTABLE and problem not in self.tractable:
+
+            trac = ["tractable", "intractable"][tractability == Tractability.INTRACTABLE]
+            print(f"Register the problem as a known {trac} problem? Y/n")
+            line = prompt(yesno=True)
+            if line:
+                newly_found = self._register_problem(problem, tractability)
+                print(f"Successfully registered {self.lattice.prettyprint(problem)} as a known {trac} problem")
+                self._print_deduced(newly_found)
+
+    # Proof for a problem, without printing anything. Returns the proof, or None, and the number of nodes
+    # expanded by the shortest proof search (0 otherwise)
+    def find_proof(self, problem, tractability, shortest=False):
+        if shortest:
+            return self.get_shortest_proof(problem, tractability)
+        elif problem in self._known(tractability):
+            return self.get_proof(problem, tractability), 0
+        else:
+            return self._search_proof(problem, tractability), 0
+
+    # Depth-first search for a known problem the given problem reduces to (resp. reduces to it)
+    def _search_proof(self, problem, tractability):
+        known = self._known(tractability)
         previous = {problem: None}
         stack = deque([problem])
         visited = {problem: True}
+        counters = STATS.counters("solve")
 
         while len(stack) > 0:
             current_problem = stack.pop()
+            if counters is not None:
+                counters.expanded += 1
 
             # Solution found
-            if (tractability == Tractability.TRACTABLE and current_problem in self.tractable) or \
-               (tractability == Tractability.INTRACTABLE and current_problem in self.intractable):
-                print("Solution found:")
+            if current_problem in known:
                 proof = []
                 while current_problem is not None:
                     proof.append(current_problem)
@@ -186,64 +588,273 @@ class ParameterizedProblem:
                 if tractability == Tractability.TRACTABLE:
                     proof.reverse()
 
-                for step_problem in proof:
-                    print(f"-> {self.frozenset_prettyprint(step_problem)}-{self.name}")
-
-                if tractability == Tractability.INTRACTABLE and problem not in self.intractable or \
-                   tractability == Tractability.TRACTABLE and problem not in self.tractable:
-
-                    trac = ["tractable", "intractable"][tractability == Tractability.INTRACTABLE]
-                    print(f"Register the problem as a known {trac} problem? Y/n")
-                    line = prompt(yesno=True)
-                    if line:
-                        st = [self.tractable, self.intractable][tractability == Tractability.INTRACTABLE]
-                        st[problem] = True
-                        print(f"Successfully registered {self.frozenset_prettyprint(problem)} as a known {trac} problem")
-
-                return
-
-            successors = []
-            if tractability == Tractability.TRACTABLE:
-                successors = self.get_natural_reductions(current_problem)
-                successors.extend(self.get_user_reductions(current_problem))
-            else:
-                successors = self.get_natural_antireductions(current_problem)
-                successors.extend(self.get_user_antireductions(current_problem))
+                return proof
 
+            successors = self._successors(current_problem, tractability == Tractability.TRACTABLE, counters)
             for succ in successors:
                 if succ not in visited:
                     previous[succ] = current_problem
                     visited[succ] = True
                     stack.append(succ)
+                elif counters is not None:
+                    counters.duplicates += 1
+
+        return None
+
+    # Breadth-first search for a proof with as few steps as possible, down to a registered problem (a known
+    # problem that was not deduced by saturation). A sequence of natural reductions counts as a single step,
+    # as it is printed, so this is a 0-1 BFS over (problem, last step was natural) states. A problem including a
+    # registered tractable problem (resp. included in a registered intractable problem) is one natural step
+    # away from it, which the index over registered problems finds directly.
+    # Returns the proof, or None, and the number of expanded nodes
+    def get_shortest_proof(self, problem, tractability):
+        registered = self._proofs(tractability).registered()
+        registered_set = dict.fromkeys(registered, True)
+        full = self.lattice.full
+
+        if tractability == Tractability.TRACTABLE:
+            natural_successors = self.get_natural_reductions
+            user_successors = self.get_user_reductions
+            index = SubsetIndex(registered)
+            registered_below = index.subsets
+        else:
+            natural_successors = self.get_natural_antireductions
+            user_successors = self.get_user_antireductions
+            index = SubsetIndex(full & ~p for p in registered)
+            registered_below = lambda p: (full & ~q for q in index.subsets(full & ~p))
+
+        # States are encoded as 2 * problem + (1 if the last step was natural else 0)
+        start = 2 * problem
+        distance = {start: 0}
+        previous = {start: None}
+        settled = {}
+        queue = deque([start])
+        expanded = 0
+        counters = STATS.counters("shortest")
+
+        while len(queue) > 0:
+            state = queue.popleft()
+            if state in settled:
+                continue
+            settled[state] = True
+            current_problem, natural = state >> 1, state & 1
+
+            if current_problem in registered_set:
+                proof = []
+                while state is not None:
+                    proof.append(state >> 1)
+                    state = previous[state]
+                if tractability == Tractability.TRACTABLE:
+                    proof.reverse()
+                return proof, expanded
+
+            expanded += 1
+            edges = [(succ, 1) for succ in natural_successors(current_problem)]
+            edges.extend((succ, 0) for succ in user_successors(current_problem))
+            for registered_problem in registered_below(current_problem):
+                if registered_problem != current_problem:
+                    edges.append((registered_problem, 1))
+                    break
+
+            if counters is not None:
+                counters.expanded += 1
+                counters.natural += sum(succ_natural for _, succ_natural in edges)
+                counters.user += sum(1 - succ_natural for _, succ_natural in edges)
+
+            for succ, succ_natural in edges:
+                if succ == current_problem:
+                    continue
+                succ_state = 2 * succ + succ_natural
+                cost = 0 if natural and succ_natural else 1
+                succ_distance = distance[state] + cost
+                if succ_state not in distance or succ_distance < distance[succ_state]:
+                    distance[succ_state] = succ_distance
+                    previous[succ_state] = state
+                    if cost == 0:
+                        queue.appendleft(succ_state)
+                    else:
+                        queue.append(succ_state)
+                elif counters is not None:
+                    counters.duplicates += 1
+
+        return None, expanded
+
+    # Shortest proofs of many problems at once, as a dict from problem to proof or None. Same proofs as
+    # get_shortest_proof, but a single 0-1 BFS is run backwards from every registered problem, over the same
+    # states, until every given problem is reached. Its search tree is shared by all proofs
+    def get_shortest_proofs(self, problems, tractability):
+        registered = self._proofs(tractability).registered()
+        if tractability == Tractability.TRACTABLE:
+            natural_predecessors = self.get_natural_antireductions
+            user_predecessors = lambda p: self._user_predecessors(p, self.antireductions_index, self.antireductions)
+        else:
+            natural_predecessors = self.get_natural_reductions
+            user_predecessors = lambda p: self._user_predecessors(p, self.reductions_index, self.reductions)
+
+        # A state goes to next[state] in the proof. Search starts in state 2 * problem (no step yet)
+        distance = {}
+        next = {}
+        queue = deque()
+        for registered_problem in registered:
+            for state in [2 * registered_problem, 2 * registered_problem + 1]:
+                distance[state] = 0
+                next[state] = None
+                queue.append(state)
+
+        remaining = {2 * problem: True for problem in problems}
+        settled = {}
+        counters = STATS.counters("shortest_backward")
+        while len(queue) > 0 and len(remaining) > 0:
+            state = queue.popleft()
+            if state in settled:
+                continue
+            settled[state] = True
+            remaining.pop(state, None)
+            current_problem, natural = state >> 1, state & 1
+            if counters is not None:
+                counters.expanded += 1
+
+            predecessors = natural_predecessors(current_problem) if natural else user_predecessors(current_problem)
+            for predecessor in predecessors:
+                if predecessor == current_problem:
+                    continue
+                if counters is not None:
+                    if natural:
+                        counters.natural += 1
+                    else:
+                        counters.user += 1
+                for predecessor_natural in [0, 1]:
+                    predecessor_state = 2 * predecessor + predecessor_natural
+                    cost = 0 if natural and predecessor_natural else 1
+                    predecessor_distance = distance[state] + cost
+                    if predecessor_state not in distance or predecessor_distance < distance[predecessor_state]:
+                        distance[predecessor_state] = predecessor_distance
+                        next[predecessor_state] = state
+                        if cost == 0:
+                            queue.appendleft(predecessor_state)
+                        else:
+                            queue.append(predecessor_state)
+                    elif counters is not None:
+                        counters.duplicates += 1
+
+        proofs = {}
+        for problem in problems:
+            state = 2 * problem
+            if state not in distance:
+                proofs[problem] = None
+                continue
 
-        print("No solution found")
+            proof = []
+            while state is not None:
+                proof.append(state >> 1)
+                state = next[state]
+            if tractability == Tractability.INTRACTABLE:
+                proof.reverse()
+            proofs[problem] = proof
+
+        return proofs
+
+    # Problems that one step of the given rules turns into the given problem. Rules map final to the list of their
+    # initial problems, and a step turns a problem including initial into (problem - initial) | final. The
+    # parameters of final that were already in the predecessor can be any subset of final - initial
+    def _user_predecessors(self, problem, index, rules):
+        for final_problem in index.subsets(problem):
+            rest = problem & ~final_problem
+            for initial_problem in rules[final_problem]:
+                if rest & initial_problem:
+                    continue
+                free = final_problem & ~initial_problem
+                kept = free
+                while True:
+                    predecessor = initial_problem | rest | kept
+                    if predecessor != 0:
+                        yield predecessor
+                    if kept == 0:
+                        break
+                    kept = (kept - 1) & free
+
+    # Proof of a known problem, rebuilt from the proofs recorded by saturation
+    def get_proof(self, problem, tractability):
+        if problem not in self._known(tractability):
+            return None
+
+        proof = self._proofs(tractability).proof(problem)
+        if tractability == Tractability.INTRACTABLE:
+            proof.reverse()
+
+        return proof
+
+    def _print_proof(self, proof):
+        print("Solution found:")
+        for step_problem in self._compact_proof(proof):
+            print(f"-> {self.lattice.prettyprint(step_problem)}-{self.name}")
+
+    # Each step of a proof reduces to the next one. Search only follows cover relations, so merge consecutive
+    # natural reductions back into a single step
+    def _compact_proof(self, proof):
+        compact = []
+        for step_problem in proof:
+            if len(compact) >= 2 and compact[-2] & compact[-1] == compact[-1] \
+               and compact[-1] & step_problem == step_problem:
+                compact.pop()
+            compact.append(step_problem)
+
+        return compact
 
     # Exploration functions
-    def open_problems(self, impact=False):
-        self._saturate_check()
+    def open_problems(self, impact=False, workers=1, **selection):
+        self._saturate_check(workers=workers)
+
+        try:
+            selected = self._select_open(**selection)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
 
         print("Currently open problems:")
-        currently_open_problems = []
-        for problem in self._parameters_powerset():
-            if problem not in self.intractable and problem not in self.tractable:
-                currently_open_problems.append(problem)
+        if not impact:
+            # Listed as they are found, as there may be too many of them to be kept in memory
+            count = 0
+            for problem in selected:
+                print("- " + self.lattice.prettyprint(problem))
+                count += 1
+
+            if count > 0:
+                print()
+            elif next(iter(self._open_problems()), None) is None:
+                print("No open problem found, congratulation!")
+            else:
+                print("No open problem matches the selection.")
+            return
 
+        currently_open_problems = list(self._open_problems())
         if len(currently_open_problems) == 0:
             print("No open problem found, congratulation!")
             return
 
-        if not impact:
-            print("".join(map(lambda p: "- " + self.frozenset_prettyprint(p) + "\n", currently_open_problems)))
-
-        else:
-            self.registered_impacts = [frozenset()]
-            for id, problem in zip(range(1, len(currently_open_problems)), currently_open_problems):
-                problem_impact = self.impact(problem)
-                print(f"{id} - {self.frozenset_prettyprint(problem)} ({len(problem_impact['tractable'])}/{len(problem_impact['intractable'])})")
-                self.registered_impacts.append({"problem": problem, "problems_list": problem_impact})
+        # Impacts are kept as bitsets over the open problems, and only listed by print_known_impact. Ids are
+        # positions among all open problems, so that they do not depend on the selection
+        self.registered_impacts = [0]
+        tractable_reach, intractable_reach = self._impact_bitsets(currently_open_problems, workers=workers)
+        for problem, tractable_solved, intractable_solved in zip(currently_open_problems, tractable_reach,
+                                                                 intractable_reach):
+            self.registered_impacts.append({"problem": problem, "open_problems": currently_open_problems,
+                                            "tractable": tractable_solved, "intractable": intractable_solved})
+
+        index_of = {problem: i for i, problem in enumerate(currently_open_problems)}
+        count = 0
+        for problem in selected:
+            id = index_of[problem] + 1
+            print(f"{id} - {self.lattice.prettyprint(problem)} ({popcount(tractable_reach[id - 1])}/{popcount(intractable_reach[id - 1])})")
+            count += 1
+
+        if count == 0:
+            print("No open problem matches the selection.")
 
     def impact(self, problem):
         newly_solved = {}
+        is_open = self._open_test()
+        counters = STATS.counters("impact")
 
         for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
             solved_by = {}
@@ -251,20 +862,17 @@ class ParameterizedProblem:
 
             while len(stack) > 0:
                 current_problem = stack.pop()
+                if counters is not None:
+                    counters.expanded += 1
 
-                if tractability == Tractability.INTRACTABLE:
-                    successors = self.get_natural_reductions(current_problem)
-                    successors.extend(self.get_user_reductions(current_problem))
-                else:
-                    successors = self.get_natural_antireductions(current_problem)
-                    successors.extend(self.get_user_antireductions(current_problem))
-
+                successors = self._impact_successors(current_problem, tractability == Tractability.INTRACTABLE,
+                                                     counters)
                 for succ in successors:
-                    if succ not in self.tractable and \
-                       succ not in self.intractable and \
-                       succ not in solved_by:
+                    if is_open(succ) and succ not in solved_by:
                         solved_by[succ] = True
                         stack.append(succ)
+                    elif counters is not None and succ in solved_by:
+                        counters.duplicates += 1
 
             results = list(solved_by.keys())
             try:
@@ -275,6 +883,26 @@ class ParameterizedProblem:
 
         return newly_solved
 
+    # Tractable and intractable impacts of the given open problems (in increasing order), as bitsets over their
+    # indices. With several workers, each one computes the reachability towards a range of problems
+    def _impact_bitsets(self, problems, workers=1):
+        with STATS.phase("impact reachability"):
+            if workers > 1:
+                import parallel
+                reaches = parallel.reachabilities(self._rules_copy(), problems, workers)
+            else:
+                counters = STATS.counters("reachability")
+                reaches = [reachability(problems, lambda problem: self._impact_successors(problem, False, counters),
+                                        counters),
+                           reachability(problems, lambda problem: self._impact_successors(problem, True, counters),
+                                        counters)]
+
+        for reach in reaches:
+            for i in range(len(problems)):
+                reach[i] &= ~(1 << i)
+
+        return reaches
+
     def print_known_impact(self, id):
         if len(self.registered_impacts) == 0:
             print("Please run command open impact first")
@@ -284,12 +912,14 @@ class ParameterizedProblem:
             print(f"Invalid problem id. Must be between 0 and {len(self.registered_impacts)}")
             return
 
-        problem = self.registered_impacts[id]["problem"]
-        problems_list = self.registered_impacts[id]["problems_list"]
+        registered_impact = self.registered_impacts[id]
+        problem = registered_impact["problem"]
+        open_problems = registered_impact["open_problems"]
 
         for tractability in ["tractable", "intractable"]:
-            print(f"Problems that are {tractability} assuming {self.frozenset_prettyprint(problem)} is {tractability}:")
-            print("".join(map(lambda p: "- " + self.frozenset_prettyprint(p) + "\n", problems_list[tractability])))
+            problems_list = [open_problems[i] for i in self.lattice.members(registered_impact[tractability])]
+            print(f"Problems that are {tractability} assuming {self.lattice.prettyprint(problem)} is {tractability}:")
+            print("".join(map(lambda p: "- " + self.lattice.prettyprint(p) + "\n", problems_list)))
 
     def print_impact(self, problem):
         if not self.check_parameters_validity(problem):
@@ -297,88 +927,501 @@ class ParameterizedProblem:
 
         self._saturate_check()
 
+        problem = self.lattice.to_mask(problem)
         problems_list = self.impact(problem)
 
         for tractability in ["tractable", "intractable"]:
-            print(f"Problems that are {tractability} assuming {self.frozenset_prettyprint(problem)} is {tractability}:")
-            print("".join(map(lambda p: "- " + self.frozenset_prettyprint(p) + "\n", problems_list[tractability])))
+            print(f"Problems that are {tractability} assuming {self.lattice.prettyprint(problem)} is {tractability}:")
+            print("".join(map(lambda p: "- " + self.lattice.prettyprint(p) + "\n", problems_list[tractability])))
+
+    # Problems both known to be tractable and intractable, with a shortest proof of each tractability
+    def check(self, workers=1):
+        self._saturate_check(workers=workers)
+
+        conflicts = self._check()
+        if len(conflicts) == 0:
+            print("No contradiction found")
+            return
+
+        print(f"Found {len(conflicts)} conflicting problems:")
+        for problem, tractable_proof, intractable_proof in conflicts:
+            print(f"{self.lattice.prettyprint(problem)}-{self.name} is both tractable and intractable")
+            for tractability, proof in [("Tractable", tractable_proof), ("Intractable", intractable_proof)]:
+                print(f"{tractability} proof:")
+                for step_problem in self._compact_proof(proof):
+                    print(f"-> {self.lattice.prettyprint(step_problem)}-{self.name}")
+            print()
+
+    def _check(self):
+        if self.store is not None:
+            conflicts = list(self.store.problems(CONFLICT))
+        else:
+            conflicts = list(self.lattice.members(self.tractable.bitset() & self.intractable.bitset()))
+
+        if len(conflicts) == 0:
+            return []
+
+        # Saturation applies rules to known problems even when the result overlaps the rule, which the searches
+        # cannot undo: such problems keep the proof recorded by saturation
+        proofs = []
+        for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
+            shortest = self.get_shortest_proofs(conflicts, tractability)
+            proofs.append({problem: proof if proof is not None else self.get_proof(problem, tractability)
+                           for problem, proof in shortest.items()})
+
+        return [(problem, proofs[0][problem], proofs[1][problem]) for problem in conflicts]
+
+    def print_plan(self, k, workers=1):
+        self._saturate_check(workers=workers)
+
+        steps = self._plan(k, workers=workers)
+        if len(steps) == 0:
+            print("No open problem found, congratulation!")
+            return
+
+        print(f"Best {len(steps)} problems to attack next (newly solved if tractable/intractable):")
+        for id, (problem, tractable_gain, intractable_gain) in enumerate(steps, 1):
+            print(f"{id} - {self.lattice.prettyprint(problem)} (+{tractable_gain}/+{intractable_gain})")
+
+    # Greedy choice of k open problems maximizing the number of open problems they solve, counting both outcomes of
+    # each chosen problem. This number is a sum of two coverage functions, so the gain of a problem can only
+    # decrease as others are chosen: gains are kept in a priority queue and only recomputed for the problem on
+    # top, until it stays on top (lazy greedy)
+    def _plan(self, k, workers=1):
+        problems = list(self._open_problems())
+        tractable_reach, intractable_reach = self._impact_bitsets(problems, workers=workers)
+
+        # Solving a problem solves itself, whatever the outcome
+        solves = [(tractable_reach[i] | 1 << i, intractable_reach[i] | 1 << i) for i in range(len(problems))]
+        covered = [0, 0]
+        heap = [(-popcount(tractable) - popcount(intractable), i, 0) for i, (tractable, intractable) in enumerate(solves)]
+        heapq.heapify(heap)
+
+        steps = []
+        while len(heap) > 0 and len(steps) < k:
+            gain, i, evaluated = heapq.heappop(heap)
+            if gain == 0:
+                break
+
+            if evaluated == len(steps):
+                tractable, intractable = solves[i]
+                steps.append((problems[i], popcount(tractable & ~covered[0]), popcount(intractable & ~covered[1])))
+                covered = [covered[0] | tractable, covered[1] | intractable]
+                continue
+
+            tractable, intractable = solves[i]
+            gain = -popcount(tractable & ~covered[0]) - popcount(intractable & ~covered[1])
+            heapq.heappush(heap, (gain, i, len(steps)))
+
+        return steps
+
+    def _saturate_check(self, workers=1):
+        if self.saturated:
+            return
 
-    def _saturate_check(self):
         print("The database must be saturated first")
         print("Saturate ? [Y/n]")
         do_saturate = prompt(yesno=True)
         if do_saturate:
-            self.saturate(verbose=1)
+            self.saturate(verbose=1, workers=workers)
         else:
             print("Skipping database saturation. Warning: unexpected results may ensue!")
 
-    def _parameters_powerset(self):
-        val_to_param = list(self.parameters)
+    def saturate(self, verbose=2, method="bitset", workers=1):
+        if verbose > 1:
+            print("Saturating database...")
 
-        for v in range(1, 2 ** len(self.parameters)):
-            problem = set()
-            for i in range(len(self.parameters)):
-                if v & (1 << i):
-                    problem.add(val_to_param[i])
+        if self.store is not None:
+            counts = self._saturate_store()
+            if verbose >= 1:
+                print(f"Added {counts['tractable']} tractable and {counts['intractable']} intractable problems to "
+                      f"database")
+            return
 
-            yield frozenset(problem)
+        newly_found = self._saturate(method=method, workers=workers)
 
-    def saturate(self, verbose=2):
-        if verbose > 1:
-            print("Saturating database...")
-        counts = {"tractable": 0, "intractable": 0}
         for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
-            if verbose >= 2:
-                print(f"Searching for {tractability.value} problems...")
-            newly_found = self._percolate(tractability)
-            if len(newly_found) > 0:
-                new_problems = "- ".join(map(lambda p: self.frozenset_prettyprint(p) + "\n", newly_found))
-                if verbose >= 2:
-                    print(f"Newly found {tractability.value} problems:\n {new_problems}")
-                counts[tractability.value] = len(newly_found)
+            found = newly_found[tractability.value]
+            if verbose < 2:
+                continue
+            if found != 0:
+                new_problems = "- ".join(map(lambda p: self.lattice.prettyprint(p) + "\n", self.lattice.members(found)))
+                print(f"Newly found {tractability.value} problems:\n {new_problems}")
             else:
-                if verbose >= 2:
-                    print(f"No new {tractability.value} problem found")
+                print(f"No new {tractability.value} problem found")
 
         if verbose >= 1:
-            print(f"Added {counts['tractable']} tractable and {counts['intractable']} intractable problems to database")
+            print(f"Added {popcount(newly_found['tractable'])} tractable and "
+                  f"{popcount(newly_found['intractable'])} intractable problems to database")
+
+    # Saturate the database, and return the newly found problems of each tractability as bitsets. Until the first
+    # saturation, the database only holds its registered problems: every other member of the closure is new,
+    # including the ones following from them by natural reduction only
+    def _saturate(self, method="bitset", workers=1):
+        newly_found = {}
+        before = {}
+        for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
+            if self.saturated:
+                before[tractability.value] = self._known(tractability).bitset()
+            else:
+                before[tractability.value] = self.lattice.to_bitset(self._proofs(tractability).registered())
+
+        # Both closures are independent, and computed by the process pool if there is one
+        closures = [None, None]
+        if method != "dfs" and workers > 1:
+            import parallel
+            directions = [(tractability, self._known(tractability).bitset())
+                          for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]]
+            with STATS.phase("saturate workers"):
+                closures = parallel.closures(self._rules_copy(), directions, workers)
+
+        for tractability, closure in zip([Tractability.TRACTABLE, Tractability.INTRACTABLE], closures):
+            with STATS.phase(f"saturate {tractability.value}"):
+                if method == "dfs":
+                    self._percolate(tractability)
+                else:
+                    self._saturate_bitset(tractability, closure)
+            newly_found[tractability.value] = self._known(tractability).bitset() & ~before[tractability.value]
+
+        self.saturated = True
+        self._journal({"op": "saturate"})
+        return newly_found
+
+    # Saturate the store from the known problems, in chunked passes. Returns the number of problems added, counted
+    # as in _saturate
+    def _saturate_store(self):
+        store = self.store
+        # The store still holds the problems found by the last saturation, if any, and problems may have been
+        # registered since
+        before = []
+        for tractability, plane in [(Tractability.TRACTABLE, 0), (Tractability.INTRACTABLE, 1)]:
+            registered = self._proofs(tractability).registered()
+            before.append(store.count(plane) + sum(not store.status(problem) >> plane & 1 for problem in registered))
+
+        self._fill_store()
+        store.saturate([(initial_problem, final_problem) for initial_problem, final_problems in self.reductions.items()
+                        for final_problem in final_problems])
+        self.saturated = True
+        self._journal({"op": "saturate"})
+
+        return {"tractable": store.count(0) - before[0], "intractable": store.count(1) - before[1]}
+
+    # Reset the store to the known problems and their natural consequences
+    def _fill_store(self):
+        self.store.clear()
+        for tractability, plane in [(Tractability.TRACTABLE, 0), (Tractability.INTRACTABLE, 1)]:
+            for problem in self._known(tractability):
+                self.store.add(plane, problem)
+
+        self.store.close_planes()
 
     # Find all problems for which we have a solution
     def _percolate(self, tractability):
         if tractability not in [Tractability.INTRACTABLE, Tractability.TRACTABLE]:
             return
 
+        return self._propagate(tractability, list(self._known(tractability)), explore_known=True)
+
+    # Register every problem deducible from the given problems, and return the new ones. Only the problems
+    # that are not known yet are explored, unless explore_known is set
+    def _propagate(self, tractability, problems, explore_known=False):
+        known = self._known(tractability)
+        proofs = self._proofs(tractability)
         newly_found = []
-        visited = [self.tractable, self.intractable][tractability == Tractability.INTRACTABLE]
-        stack = deque(visited.keys())
+        derived = [problem for problem in problems if problem not in known]
+        visited = dict.fromkeys(problems, True)
+        stack = deque(problems)
+        counters = STATS.counters("percolate")
 
         while len(stack) > 0:
             current_problem = stack.pop()
+            if counters is not None:
+                counters.expanded += 1
+
+            for succ, rule in self.get_derivations(current_problem, tractability):
+                if counters is not None:
+                    if rule is None:
+                        counters.natural += 1
+                    else:
+                        counters.user += 1
+                if succ in visited:
+                    if counters is not None:
+                        counters.duplicates += 1
+                    continue
 
-            if tractability == Tractability.INTRACTABLE:
-                successors = self.get_natural_reductions(current_problem)
-                successors.extend(self.get_user_reductions(current_problem))
-            else:
-                successors = self.get_natural_antireductions(current_problem)
-                successors.extend(self.get_user_antireductions(current_problem))
+                already_known = succ in known
+                if already_known and not explore_known:
+                    continue
 
-            for succ in successors:
-                if succ not in visited:
-                    visited[succ] = True
-                    stack.append(succ)
+                visited[succ] = True
+                stack.append(succ)
+                if not already_known:
                     newly_found.append(succ)
+                    if rule is not None:
+                        proofs.record(succ, current_problem, rule)
+                        derived.append(succ)
+
+        # Problems found by natural reduction follow from the derived ones
+        for problem in derived:
+            known.add(problem)
 
         return newly_found
 
+    # Same result as _percolate, computed with whole-lattice bitset passes until a fixpoint is reached. Returns
+    # the new problems as a bitset
+    def _saturate_bitset(self, tractability, closure=None):
+        if tractability not in [Tractability.INTRACTABLE, Tractability.TRACTABLE]:
+            return
+
+        known = self._known(tractability)
+        initial_status = known.bitset()
+        if closure is None:
+            closure = self._bitset_closure(tractability, initial_status)
+        status, derivations = closure
+
+        proofs = self._proofs(tractability)
+        for problem, predecessor, rule in derivations:
+            proofs.record(problem, predecessor, rule)
+        known.set_bitset(status)
+
+        return status & ~initial_status
+
+    # Closure of a bitset of known problems, along with the derivations by user reductions it relies on, as
+    # (problem, predecessor, rule) in the order they were found. Only the derived problems with no lower
+    # (resp. upper) cover among the ones derived by the same pass are kept: the others follow by natural reduction
+    def _bitset_closure(self, tractability, status):
+        lattice = self.lattice
+        derivations = []
+        counters = STATS.counters("saturate")
+
+        while True:
+            previous = status
+            if tractability == Tractability.TRACTABLE:
+                status = lattice.up_closure(status)
+            else:
+                status = lattice.down_closure(status)
+            if counters is not None:
+                counters.passes += 1
+                counters.natural += popcount(status & ~previous)
+
+            derived = status
+            for initial_problem, final_problems in self.reductions.items():
+                for final_problem in final_problems:
+                    rule = (initial_problem, final_problem)
+                    if tractability == Tractability.TRACTABLE:
+                        passed = lattice.tractable_pass(status, initial_problem, final_problem)
+                    else:
+                        passed = lattice.intractable_pass(status, initial_problem, final_problem)
+                    new = passed & ~derived
+                    if counters is not None:
+                        counters.user += popcount(new)
+                        counters.duplicates += popcount(passed & derived)
+
+                    if tractability == Tractability.TRACTABLE:
+                        for problem in lattice.members(lattice.minimal_bitset(new)):
+                            derivations.append((problem, problem | final_problem, rule))
+                    else:
+                        for problem in lattice.members(lattice.maximal_bitset(new)):
+                            derivations.append((problem, (problem & ~final_problem) | initial_problem, rule))
+                    derived |= new
+
+            if derived == status:
+                return status, derivations
+            status = derived
+
+    # Parameter classes
+    # A user reduction whose final problem includes its initial one makes any problem including the initial one
+    # equivalent to its union with the final one: the user reduction goes up, and a natural reduction comes back.
+    # Parameters absorbing each other through such reductions are interchangeable, and are merged into a single
+    # parameter of a smaller lattice. A parameter only absorbed by others cannot be merged, as the problems left
+    # once equivalent ones are merged are not the subsets of fewer parameters, see Lattice.restrict. Saturation and
+    # searches keep running on the whole lattice, where equivalent problems get the same tractability, while open
+    # problems, impacts and plans are restricted to canonical problems
+    def collapse(self, verbose=True):
+        result = self.collapse_result()
+        if not verbose:
+            return result
+
+        if len(result.classes) == 0:
+            print("No interchangeable parameters")
+        for parameter_class in result.classes:
+            print(f"Merged interchangeable parameters {self.frozenset_prettyprint(parameter_class)}")
+        for parameters, absorbing in result.dominated:
+            print(f"{self.frozenset_prettyprint(parameters)} is absorbed by any of "
+                  f"{self.frozenset_prettyprint(absorbing)}: open problems with one of them are only listed with "
+                  f"{self.frozenset_prettyprint(parameters)}")
+        if len(result.classes) > 0:
+            print(f"Lattice reduced to {self.lattice.size} parameters")
+
+        return result
+
+    # Closure of every parameter under absorbing reductions, as a mapping from its bit to the closure mask
+    def _absorptions(self):
+        rules = [(initial_problem, final_problem) for initial_problem, final_problems in self.reductions.items()
+                 for final_problem in final_problems
+                 if initial_problem & ~final_problem == 0 and final_problem != initial_problem]
+
+        closures = {}
+        for i in range(self.lattice.size):
+            closure = 1 << i
+            changed = True
+            while changed:
+                changed = False
+                for initial_problem, final_problem in rules:
+                    if initial_problem & ~closure == 0 and final_problem & ~closure:
+                        closure |= final_problem
+                        changed = True
+            closures[1 << i] = closure
+
+        return closures
+
+    # Rebuild the database over the lattice of the given classes, as masks partitioning the parameters. Problems
+    # with a whole class or none of it map to a problem of the quotient, the others being equivalent to the one
+    # with their classes completed. A reduction applies when its initial problem meets the classes, and removes
+    # the classes it contains entirely
+    def _collapse(self, classes):
+        lattice = self.lattice
+        rules = [(initial_problem, final_problem) for initial_problem, final_problems in self.reductions.items()
+                 for final_problem in final_problems]
+        registered = {tractability: self._proofs(tractability).registered()
+                      for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]}
+        saturated = self.saturated
+        log, self.journal = self.journal, None
+
+        representatives = {}
+        for parameter_class in classes:
+            members = sorted(lattice.to_problem(parameter_class))
+            representatives[members[0]] = members
+
+        self.set_parameters(self.parameters, representatives)
+        self.reductions = {}
+        self.antireductions = {}
+        self._index_reductions()
+        self.saturated = False
+        self.registered_impacts = []
+
+        def quotient(mask):
+            return self.lattice.to_mask(lattice.to_problem(mask))
+
+        for initial_problem, final_problem in rules:
+            removed = sum(quotient(parameter_class) for parameter_class in classes
+                          if parameter_class & ~initial_problem == 0)
+            initial = quotient(initial_problem)
+            final = (initial & ~removed) | quotient(final_problem)
+            if final != initial and final not in self.reductions.get(initial, []):
+                self._add_reduction(initial, final)
+
+        for tractability, problems in registered.items():
+            for problem in problems:
+                self._register_problem(quotient(problem), tractability)
+
+        if saturated:
+            self.saturate_result()
+
+        self.journal = log
+        if self.journal is not None:
+            self._compact_journal()
+
+    # Rule compilation
+    # Reductions that follow from the others are removed, so that every search and saturation pass goes through
+    # fewer of them. Problems keep their tractability, but proofs may take more steps through the remaining ones
+    def compile(self, verbose=True):
+        result = self.compile_result()
+        if not verbose:
+            return result
+
+        def rule_prettyprint(rule):
+            return f"{self.frozenset_prettyprint(rule[0])} > {self.frozenset_prettyprint(rule[1])}"
+
+        for rule in result.duplicates:
+            print(f"Removed duplicate reduction {rule_prettyprint(rule)}")
+        for rule in result.natural:
+            print(f"Removed reduction {rule_prettyprint(rule)}, which is a natural reduction")
+        for rule, others in result.subsumed:
+            print(f"Removed reduction {rule_prettyprint(rule)}, which follows from "
+                  f"{' then '.join(map(rule_prettyprint, others))}")
+
+        count = sum(len(final_problems) for final_problems in self.reductions.values())
+        print(f"Removed {len(result.duplicates) + len(result.natural) + len(result.subsumed)} reductions, "
+              f"{count} left")
+        return result
+
+    # A reduction L > R takes any problem P including L to (P \ L) | R. It follows from natural reductions if R is
+    # included in L. It follows from a reduction L1 > R1 if L1 is included in L and R in R1 | (L \ L1), and from
+    # L1 > R1 then L2 > R2 if in addition L2 is included in (L \ L1) | R1, the parameters of L2 outside of L are
+    # added back by R2, and R is included in (R1 \ L2) | R2 | (L \ (L1 | L2)). Returns the removed reductions
+    def _compile(self):
+        pruned = {"duplicates": [], "natural": [], "subsumed": []}
+        rules = []
+        seen = set()
+        for initial_problem, final_problems in self.reductions.items():
+            for final_problem in final_problems:
+                if (initial_problem, final_problem) in seen:
+                    pruned["duplicates"].append((initial_problem, final_problem))
+                elif final_problem & ~initial_problem == 0:
+                    pruned["natural"].append((initial_problem, final_problem))
+                else:
+                    rules.append((initial_problem, final_problem))
+                seen.add((initial_problem, final_problem))
+
+        # Later reductions are tried first, so that the first ones entered are the ones kept
+        kept = {}
+        for rule in rules:
+            kept.setdefault(rule[0], []).append(rule[1])
+        index = SubsetIndex(kept.keys())
+
+        for initial_problem, final_problem in reversed(rules):
+            kept[initial_problem].remove(final_problem)
+            others = self._implying_rules(initial_problem, final_problem, kept, index)
+            if others is None:
+                kept[initial_problem].append(final_problem)
+            else:
+                pruned["subsumed"].append(((initial_problem, final_problem), others))
+
+        self.reductions = {}
+        self.antireductions = {}
+        for initial_problem, final_problem in rules:
+            if final_problem in kept[initial_problem]:
+                self.reductions.setdefault(initial_problem, []).append(final_problem)
+                self.antireductions.setdefault(final_problem, []).append(initial_problem)
+        self._index_reductions()
+
+        if self.journal is not None:
+            self._compact_journal()
+
+        return pruned
+
+    def _implying_rules(self, initial_problem, final_problem, rules, index):
+        for first_initial in index.subsets(initial_problem):
+            rest = initial_problem & ~first_initial
+            for first_final in rules[first_initial]:
+                if final_problem & ~(first_final | rest) == 0:
+                    return [(first_initial, first_final)]
+
+                for second_initial in index.subsets(rest | first_final):
+                    outside = second_initial & ~initial_problem
+                    left = rest & ~second_initial
+                    for second_final in rules[second_initial]:
+                        if outside & ~second_final == 0 and \
+                                final_problem & ~((first_final & ~second_initial) | second_final | left) == 0:
+                            return [(first_initial, first_final), (second_initial, second_final)]
+
+        return None
+
     # Save and load
-    def save(self, name):
-        data = {"name": self.name,
-                "parameters": self.serialize_frozenset(self.parameters),
-                "reductions": self.serialize_dic(self.reductions),
-                "antireductions": self.serialize_dic(self.antireductions),
-                "tractable": self.serialize_dic(self.tractable),
-                "intractable": self.serialize_dic(self.intractable)}
+    # Saving does not write the cache of the file, see cache.py: the next load of the file writes it, from the state
+    # loading builds, so that loading gives the same state whether the cache is used or not
+    def save(self, name, verbose=True):
+        if self.journal is not None and os.path.abspath(name) == os.path.abspath(self.journal.path):
+            if not self._compact_journal():
+                if verbose:
+                    print(f"Error saving file {name}")
+                return False
+            if verbose:
+                print(f"Compacted journal {name}")
+            return True
 
+        data = self._snapshot()
         data_json = json.dumps(data, indent=4)
 
         try:
@@ -386,47 +1429,170 @@ class ParameterizedProblem:
             f.write(data_json)
             f.close()
         except (IOError, OSError) as e:
-            print(f"Error saving file: {e}")
+            if verbose:
+                print(f"Error saving file: {e}")
+            return False
+
+        if verbose:
+            print(f"Saved file {name}")
+        return True
+
+    # Keep the database in a journal at the given path from now on, starting from a snapshot of its current state.
+    # See journal.py
+    def start_journal(self, name, verbose=True):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        data = self._snapshot()
+        if not journal.write_snapshot(name, data):
+            if verbose:
+                print(f"Error writing journal {name}")
+            return False
+
+        self.journal = journal.Journal(name)
+
+        if verbose:
+            print(f"Edits are now journaled to {name}")
+        return True
+
+    def _compact_journal(self):
+        name = self.journal.path
+        self.journal.close()
+        self.journal = None
+
+        data = self._snapshot()
+        written = journal.write_snapshot(name, data)
+        self.journal = journal.Journal(name)
+        return written
+
+    def _journal(self, record):
+        if self.journal is None:
             return
 
-        print(f"Saved file {name}")
+        self.journal.append(record)
+        if self.journal.needs_compaction():
+            self._compact_journal()
 
-    def load(self, name):
+    def _snapshot(self):
+        data = {"name": self.name,
+                "parameters": self.serialize_frozenset(self.parameters),
+                "reductions": self.serialize_dic(self.reductions),
+                "antireductions": self.serialize_dic(self.antireductions),
+                "tractable": self.serialize_dic(self.tractable.elements),
+                "intractable": self.serialize_dic(self.intractable.elements)}
+
+        # Merged parameters are saved as the reductions they were merged from
+        for members in self.lattice.classes.values():
+            if len(members) > 1:
+                for member in members:
+                    data["reductions"].setdefault(member, []).append(" ".join(members))
+                data["antireductions"].setdefault(" ".join(members), []).extend(members)
+
+        return data
+
+    # Unless use_cache is False, the database comes out saturated: from the cache of the file if it matches its
+    # content, otherwise by saturating it and writing the cache for the next time. A journal is loaded from its
+    # snapshot the same way, then its edits are replayed, and the later edits are appended to it
+    def load(self, name, verbose=True, use_cache=True, workers=1):
         try:
             f = open(name, "r+")
         except (OSError, IOError):
-            print(f"File not found: {name}")
-            return
+            if verbose:
+                print(f"File not found: {name}")
+            return False
+
+        with f:
+            content = f.read()
 
+        journaled = journal.read_journal(content)
         try:
-            data_json = json.loads(f.read())
+            data_json = journaled[0] if journaled is not None else json.loads(content)
         except:
-            print("Corrupted problem data file")
-            return
+            if verbose:
+                print("Corrupted problem data file")
+            return False
 
         self.name = data_json["name"]
-        self.parameters = self.deserialize_frozenset(data_json["parameters"])
+        self.set_parameters(self.deserialize_frozenset(data_json["parameters"]))
         self.reductions = self.deserialize_dic(data_json["reductions"])
         self.antireductions = self.deserialize_dic(data_json["antireductions"])
-        self.tractable = self.deserialize_dic(data_json["tractable"])
-        self.intractable = self.deserialize_dic(data_json["intractable"])
-
-        print(f"Successfully loaded file {name}")
+        self._index_reductions()
+        for tractability in [Tractability.TRACTABLE, Tractability.INTRACTABLE]:
+            for problem in self.deserialize_dic(data_json[tractability.value]):
+                self._proofs(tractability).record(problem)
+                self._known(tractability).add(problem)
+        self.saturated = False
+
+        if verbose:
+            print(f"Successfully loaded file {name}")
+
+        if use_cache and self.store is None:
+            digest = cache.content_hash(data_json)
+            with STATS.phase("load cache"):
+                cached = cache.read_cache(name, digest, self.lattice.size)
+            if cached is not None:
+                self._restore_cache(*cached)
+                if verbose:
+                    print("Loaded saturated database from cache")
+            else:
+                self.saturate(verbose=min(verbose, 1), workers=workers)
+                if self._write_cache(name, digest) and verbose:
+                    print(f"Wrote cache {cache.cache_path(name)}")
+
+        if journaled is not None:
+            _, records, length = journaled
+            with STATS.phase("load replay"):
+                for record in records:
+                    self._replay(record, use_cache, workers)
+            self.journal = journal.Journal(name, len(records), length)
+            if verbose and len(records) > 0:
+                print(f"Replayed {len(records)} journaled edits")
 
+        return True
 
+    def _replay(self, record, use_cache=True, workers=1):
+        if record["op"] == "reduction":
+            self._add_reduction(self.deserialize_mask(record["initial"]), self.deserialize_mask(record["final"]))
+        elif record["op"] == "saturate":
+            if use_cache and not self.saturated:
+                self.saturate_result(workers=workers)
+        else:
+            self._register_problem(self.deserialize_mask(record["problem"]), Tractability(record["op"]))
+
+    def _write_cache(self, name, digest):
+        tractabilities = [Tractability.TRACTABLE, Tractability.INTRACTABLE]
+        bitsets = [self._known(tractability).bitset() for tractability in tractabilities]
+        proofs = [[(problem, predecessor, rule)
+                   for problem, (predecessor, rule, _) in self._proofs(tractability).items()]
+                  for tractability in tractabilities]
+
+        return cache.write_cache(name, digest, self.lattice.size, bitsets, proofs)
+
+    def _restore_cache(self, bitsets, proofs):
+        self.tractable_proofs = ProofStore(self.lattice, minimal=True)
+        self.intractable_proofs = ProofStore(self.lattice, minimal=False)
+        for tractability, bitset, entries in zip([Tractability.TRACTABLE, Tractability.INTRACTABLE], bitsets, proofs):
+            for problem, predecessor, rule in entries:
+                self._proofs(tractability).record(problem, predecessor, rule)
+            self._known(tractability).set_bitset(bitset)
+        self.saturated = True
 
     def serialize_dic(self, dic):
-        return self.deep_map_dic(dic, self.serialize_frozenset)
+        return self.deep_map_dic(dic, self.lattice.serialize)
 
     def serialize_frozenset(self, s):
         return " ".join(sorted(list(s)))
 
     def deserialize_dic(self, sdic):
-        return self.deep_map_dic(sdic, self.deserialize_frozenset)
+        return self.deep_map_dic(sdic, self.deserialize_mask)
 
     def deserialize_frozenset(self, s):
         return frozenset(s.split())
 
+    def deserialize_mask(self, s):
+        return self.lattice.to_mask(s.split())
+
     def deep_map_dic(self, dic, fun):
         new_dic = {}
 
@@ -434,14 +1600,120 @@ class ParameterizedProblem:
             new_key = fun(key)
             new_val = val
             if isinstance(val, list):
-                # Either we are serializing or deserializing, respectively
-                if len(val) > 0 and (isinstance(val[0], frozenset) or isinstance(val[0], str)):
+                # Either we are serializing (masks) or deserializing (strings), respectively
+                if len(val) > 0 and (isinstance(val[0], int) or isinstance(val[0], str)):
                     new_val = list(map(fun, val))
             new_dic[new_key] = new_val
 
         return new_dic
 
     # Utils
+    # Problems that are neither known to be tractable nor intractable, as a bitset
+    def _open_bitset(self):
+        return self.lattice.canonical_bitset() & ~self.tractable.bitset() & ~self.intractable.bitset()
+
+    # Open problems in increasing order, and a membership test for them, read from the store if there is one.
+    # Only the problems including every parameter of include and none of exclude are listed, and with boundary
+    # "minimal" (resp. "maximal"), only the ones with no smaller (resp. larger) open problem among them. Once the
+    # lattice is restricted, only canonical problems are open
+    def _open_problems(self, include=0, exclude=0, boundary=None):
+        if self.store is not None:
+            if not self.saturated:
+                self._fill_store()
+            if not self.lattice.absorbed:
+                return self.store.problems(UNKNOWN, include, exclude, boundary)
+            return self._canonical_store_problems(include, exclude, boundary)
+
+        # Open problems form a convex set, so covers are enough to find its boundary
+        open_bitset = self._open_bitset()
+        if include or exclude:
+            open_bitset &= self.lattice.supersets_bitset(include) & self.lattice.disjoint_bitset(exclude)
+        if boundary == "minimal":
+            open_bitset = self.lattice.minimal_bitset(open_bitset)
+        elif boundary == "maximal":
+            open_bitset = self.lattice.maximal_bitset(open_bitset)
+
+        return self.lattice.members(open_bitset)
+
+    # Canonical problems have canonical covers in the direction of any other canonical problem, so that the
+    # boundaries are found by testing covers, as for the whole lattice
+    def _canonical_store_problems(self, include, exclude, boundary):
+        lattice = self.lattice
+
+        def selected(problem):
+            return lattice.canonical(problem) == problem and self.store.status(problem) == UNKNOWN
+
+        for problem in self.store.problems(UNKNOWN, include, exclude):
+            if not selected(problem):
+                continue
+            if boundary == "minimal":
+                covers = (cover for cover in lattice.lower_covers(problem) if cover & include == include)
+            elif boundary == "maximal":
+                covers = (cover for cover in lattice.upper_covers(problem) if cover & exclude == 0)
+            else:
+                covers = ()
+            if not any(selected(cover) for cover in covers):
+                yield problem
+
+    # Lazily selected open problems. include and exclude are parameters, and sizes count parameters
+    def _select_open(self, include=(), exclude=(), min_size=1, max_size=None, boundary=None, offset=0, limit=None):
+        problems = self._open_problems(self._parameters_mask(include), self._parameters_mask(exclude), boundary)
+        if min_size > 1 or max_size is not None:
+            problems = (problem for problem in problems
+                        if min_size <= popcount(problem) and (max_size is None or popcount(problem) <= max_size))
+
+        return itertools.islice(problems, offset, None if limit is None else offset + limit)
+
+    def _open_test(self):
+        if self.store is not None:
+            if not self.saturated:
+                self._fill_store()
+            canonical = self.lattice.canonical
+            return lambda problem: self.store.status(problem) == UNKNOWN and canonical(problem) == problem
+
+        open_view = self.lattice.view(self._open_bitset())
+        return lambda problem: in_view(open_view, problem)
+
+    def _known(self, tractability):
+        return [self.tractable, self.intractable][tractability == Tractability.INTRACTABLE]
+
+    def _proofs(self, tractability):
+        return [self.tractable_proofs, self.intractable_proofs][tractability == Tractability.INTRACTABLE]
+
+    # Copy of the problem without its known problems, cheap enough to be sent to worker processes
+    def _rules_copy(self):
+        rules = ParameterizedProblem()
+        rules.name = self.name
+        rules.set_parameters(self.parameters, self.lattice.classes)
+        rules.lattice.restrict(self.lattice.absorbed)
+        rules.reductions = self.reductions
+        rules.antireductions = self.antireductions
+        rules._index_reductions()
+        return rules
+
+    # Copy of the problem to edit while this one goes on answering queries. The lattice and the proof entries are
+    # shared with the copy, see ProofStore.copy: neither this problem nor the copy may be collapsed or have its
+    # parameters changed, and this problem must not be edited anymore
+    def write_copy(self):
+        problem = copy.copy(self)
+        problem.tractable = self.tractable.copy()
+        problem.intractable = self.intractable.copy()
+        problem.tractable_proofs = self.tractable_proofs.copy()
+        problem.intractable_proofs = self.intractable_proofs.copy()
+        problem.reductions = {initial: list(finals) for initial, finals in self.reductions.items()}
+        problem.antireductions = {final: list(initials) for final, initials in self.antireductions.items()}
+        problem.reductions_index = self.reductions_index.copy()
+        problem.antireductions_index = self.antireductions_index.copy()
+        problem.registered_impacts = list(self.registered_impacts)
+        return problem
+
+    # Build what queries would otherwise compute on first use, so that threads answering them only read the problem
+    def build_caches(self):
+        self.lattice.layers()
+        self.lattice.canonical_bitset()
+        self.tractable.bitset()
+        self.intractable.bitset()
+
     def check_parameters_validity(self, param_list):
         for param in param_list:
             if param not in self.parameters:
@@ -473,125 +1745,440 @@ def prompt(yesno=False):
     return line
 
 
-def main():
-    print(f"Parameterized problem finder v{VERSION}")
-    problem = None
-    if args.filename:
-        problem = ParameterizedProblem()
-        problem.load(args.filename)
+# Batch mode: the database is loaded and saturated once, then every query line is answered without prompting.
+# Queries are "solve tractable|intractable [--shortest] params.." and "classify params..". Empty lines and lines
+# starting with # are skipped
+def run_batch(problem, lines, as_json=False, workers=1):
+    if not problem.saturated:
+        problem.saturate_result(workers=workers)
 
-    while True:
-        command = prompt().split()
-
-        if len(command) == 0:
+    for line in lines:
+        command = line.split()
+        if len(command) == 0 or command[0].startswith("#"):
             continue
 
-        if command[0] == "help":
-            print("Commands:\n"
-                  " init [guided] - Initialize a parameterized problem. Add option \"guided\" for help with the"
-                  " syntax\n"
-                  " add tractable|intractable|reduction - Specify the tractability of a problem,"
-                  "or add a known reduction. You will be prompted the problem or reduction to add.\n"
-                  " solve tractable|intractable [params..] - Check if a problem's tractability is known or can be"
-                  " deduced\n"
-                  " saturate - Try to solve as many problems are possible\n"
-                  " open [impact] - Show all open problems, and the consequences of solving them if option \"impact\""
-                  " is specified \n"
-                  " impact [id|[params..]] - Shows which problems would be solved by solving another problem. If command"
-                  " open impact was run before, the id of the problem can be specified. Otherwise, a list of parameters"
-                  " can be given"
-                  " save filename - Save the current state in a file\n"
-                  " load filename - Load a parameterized problem\n"
-                  "Format:\n"
-                  " [params..] - List of parameters, with whitespace \" \" as separator\n"
-                  " [reduction] - List of parameters separated by character \">\""
-                  )
-
-        elif command[0] == "init":
-            problem = ParameterizedProblem()
-            guided = False
-            if len(command) > 1 and (command[1] == "g" or command[1] == "guided"):
-                guided = True
-            problem.manual_initialization(guided=guided)
-
-        elif command[0] == "add":
-            if problem is None:
-                print("You must initialize the problem first")
-                continue
+        start = time.perf_counter()
+        result = {"query": " ".join(command)}
+        result.update(batch_query(problem, command))
+        result["time"] = time.perf_counter() - start
 
-            if len(command) > 1:
-                if command[1] == "tractable":
-                    print("Problem: ", end="")
-                    problem.add_problem(Tractability.TRACTABLE)
-                elif command[1] == "intractable":
-                    print("Problem: ", end="")
-                    problem.add_problem(Tractability.INTRACTABLE)
-                elif command[1] == "reduction":
-                    problem.add_reduction()
-            else:
-                print("Usage: add tractable|intractable|reduction")
+        if as_json:
+            print(json.dumps(result), flush=True)
+        else:
+            print_batch_result(result)
 
-        elif command[0] == "solve":
-            if len(command) > 2:
-                current_parameters = frozenset(command[2:])
-                if command[1] == "intractable":
-                    problem.solve(current_parameters, tractability=Tractability.INTRACTABLE)
-                    continue
-                elif command[1] == "tractable":
-                    problem.solve(current_parameters, tractability=Tractability.TRACTABLE)
-                    continue
-                else:
-                    print(f"Unknown value: {command[1]}")
-            else:
-                print("Usage: solve tractable|intractable params*")
-                continue
 
-        elif command[0] == "saturate":
-            if problem is None:
-                print("You must initialize the problem first")
-                continue
-            problem.saturate()
+def batch_query(problem, command):
+    shortest = "--shortest" in command
+    if shortest:
+        command = [word for word in command if word != "--shortest"]
+
+    if len(command) > 2 and command[0] == "solve" and command[1] in ["tractable", "intractable"]:
+        tractabilities = [Tractability(command[1])]
+        parameters = command[2:]
+    elif len(command) > 1 and command[0] == "classify":
+        tractabilities = [Tractability.TRACTABLE, Tractability.INTRACTABLE]
+        parameters = command[1:]
+    else:
+        return {"status": "error", "error": "Unknown command"}
+
+    for tractability in tractabilities:
+        try:
+            result = problem.solve_result(parameters, tractability, shortest=shortest)
+        except ValueError as e:
+            return {"status": "error", "error": str(e)}
+
+        if result.proof is not None:
+            solved = {"status": tractability.value if command[0] == "classify" else "solved",
+                      "tractability": tractability.value,
+                      "proof": [sorted(step) for step in result.proof]}
+            if shortest:
+                solved["expanded"] = result.expanded
+            return solved
+
+    return {"status": "open" if command[0] == "classify" else "unsolved"}
+
+
+# Queries of the server, see server.py: those of batch mode, along with impact [params], open [options] and
+# add tractable|intractable [params] or add reduction [reduction]
+SERVER_WRITES = ["add"]
+MEASURED_COMMANDS = ["init", "add", "solve", "saturate", "open", "check", "plan", "compile", "collapse", "impact",
+                     "save", "journal", "load"]
+
+
+def serve_query(problem, command):
+    if command[0] in ["solve", "classify"]:
+        return batch_query(problem, command)
+
+    def decode(problems):
+        return [sorted(p) for p in problems]
+
+    try:
+        if command[0] == "impact" and len(command) > 1:
+            result = problem.impact_result(command[1:])
+            return {"status": "ok", "tractable": decode(result.tractable), "intractable": decode(result.intractable)}
 
         elif command[0] == "open":
-            if problem is None:
-                print("You must initialize the problem first")
-                continue
-            if len(command) > 1 and command[1] == "impact":
-                problem.open_problems(impact=True)
-            else:
-                problem.open_problems()
+            selection = parse_open_options(command[1:])
+            if selection is not None:
+                return {"status": "ok", "problems": decode(problem.open_problems_result(**selection))}
+
+        elif command[0] == "add" and len(command) > 2 and command[1] in ["tractable", "intractable"]:
+            newly_found = problem.register_problem(command[2:], Tractability(command[1]))
+            return {"status": "added", "tractable": decode(newly_found["tractable"]),
+                    "intractable": decode(newly_found["intractable"])}
+
+        elif command[0] == "add" and len(command) > 2 and command[1] == "reduction":
+            reduction = " ".join(command[2:]).split(">")
+            if len(reduction) == 2:
+                newly_found = problem.register_reduction(reduction[0].split(), reduction[1].split())
+                return {"status": "added", "tractable": decode(newly_found["tractable"]),
+                        "intractable": decode(newly_found["intractable"])}
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+    return {"status": "error", "error": "Unknown command"}
+
+
+def print_batch_result(result):
+    if "proof" in result:
+        steps = " -> ".join("{" + ", ".join(step) + "}" for step in result["proof"])
+        print(f"{result['query']}: {result['status']} ({steps})")
+    elif "error" in result:
+        print(f"{result['query']}: {result['error']}")
+    else:
+        print(f"{result['query']}: {result['status']}")
+
+
+# Options of the open command, as arguments of ParameterizedProblem._select_open. Returns None if they are invalid
+def parse_open_options(words):
+    selection = {}
+    words = list(words)
+    while len(words) > 0:
+        option = words.pop(0)
+        if option in ["--minimal", "--maximal"]:
+            selection["boundary"] = option[2:]
+            continue
 
-        elif command[0] == "impact":
-            if problem is None:
-                print("You must initialize the problem fist")
-                continue
-            if len(command) > 1:
-                if command[1].isdigit():
-                    problem.print_known_impact(int(command[1]))
-                else:
-                    current_parameters = frozenset(command[1:])
-                    problem.print_impact(current_parameters)
+        if len(words) == 0:
+            return None
+        value = words.pop(0)
 
-        elif command[0] == "save":
-            if len(command) > 1:
-                problem.save(command[1])
+        try:
+            if option in ["--limit", "--offset"]:
+                selection[option[2:]] = int(value)
+            elif option == "--size":
+                sizes = value.split("-")
+                selection["min_size"], selection["max_size"] = int(sizes[0]), int(sizes[-1])
+            elif option in ["--include", "--exclude"]:
+                selection[option[2:]] = value.split(",")
             else:
-                print("You must specify a file name")
-
-        elif command[0] == "load":
-            if len(command) > 1:
-                problem = ParameterizedProblem()
-                problem.load(command[1])
+                return None
+        except ValueError:
+            return None
+
+    return selection
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Parameterized complexity')
+    parser.add_argument('-f', dest='filename', action='store', default=None,
+                        help='the path of the file to open')
+    parser.add_argument('--workers', dest='workers', action='store', type=int, default=1,
+                        help='the number of processes used by open impact, and by saturate, which uses at most 2')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='neither read nor write the saturation cache of loaded files')
+    parser.add_argument('--store', dest='store', action='store', default=None,
+                        help='keep saturation results in a memory-mapped file at this path, for large classes')
+    parser.add_argument('--collapse', dest='collapse', action='store_true',
+                        help='merge interchangeable parameters of loaded files, as command collapse does')
+    parser.add_argument('--batch', dest='batch', action='store', default=None,
+                        help='run the queries of a file (- for the standard input) without prompting, then exit')
+    parser.add_argument('--serve', dest='serve', action='store', default=None,
+                        help='answer queries from clients on a local port ([host:]port) or Unix socket path, until'
+                             ' interrupted')
+    parser.add_argument('--threads', dest='threads', action='store', type=int, default=4,
+                        help='the number of queries answered at the same time by the server')
+    parser.add_argument('--profile', dest='profile', nargs='?', const='', default=None,
+                        help='turn instrumentation on from the start, and with a path, dump a cProfile profile of each'
+                             ' command (of the whole batch in batch mode) to it')
+    parser.add_argument('--json', dest='json', action='store_true',
+                        help='print batch results as JSON, one object per line')
+
+    return parser.parse_args(argv)
+
+
+def batch_main(args):
+    if not args.filename:
+        print("Batch mode needs a problem file, given with -f", file=sys.stderr)
+        return 1
+
+    problem = ParameterizedProblem(store_path=args.store)
+    if not problem.load(args.filename, verbose=False, use_cache=args.cache, workers=args.workers):
+        print(f"Could not load file {args.filename}", file=sys.stderr)
+        return 1
+    if args.collapse:
+        problem.collapse_result()
+
+    if args.batch == "-":
+        run_batch(problem, sys.stdin, as_json=args.json, workers=args.workers)
+    else:
+        try:
+            f = open(args.batch, "r")
+        except (OSError, IOError):
+            print(f"File not found: {args.batch}", file=sys.stderr)
+            return 1
+        with f:
+            run_batch(problem, f, as_json=args.json, workers=args.workers)
+    return 0
+
+
+# Counters and phase times, followed by the functions taking the most time in the last profile dumped, if any
+def print_stats(profile_path=None, file=sys.stdout):
+    lines = STATS.report()
+    if len(lines) == 0:
+        print("Nothing measured yet" if STATS.enabled else "Instrumentation is off, turn it on with \"stats on\"",
+              file=file)
+    for line in lines:
+        print(line, file=file)
+
+    if profile_path and os.path.exists(profile_path):
+        print(f"Last profiled command, dumped to {profile_path}:", file=file)
+        print(instrument.profile_summary(profile_path), file=file)
+
+
+# Runs one command of interactive mode. Returns the problem to run the next commands on, which init and load replace
+def run_command(problem, command, args):
+    if command[0] == "help":
+        print("Commands:\n"
+              " init [guided] - Initialize a parameterized problem. Add option \"guided\" for help with the"
+              " syntax\n"
+              " add tractable|intractable|reduction - Specify the tractability of a problem,"
+              "or add a known reduction. You will be prompted the problem or reduction to add.\n"
+              " solve tractable|intractable [--shortest] [params..] - Check if a problem's tractability is known or"
+              " can be deduced. Add option \"--shortest\" for a proof with as few steps as possible\n"
+              " saturate [dfs] - Try to solve as many problems are possible. Add option \"dfs\" to use the"
+              " search-based saturation instead of the bitset one\n"
+              " open [impact] [options] - Show all open problems, and the consequences of solving them if option"
+              " \"impact\" is specified. Options: --limit n, --offset n, --size n|min-max, --include params,..,"
+              " --exclude params,.., --minimal, --maximal\n"
+              " impact [id|[params..]] - Shows which problems would be solved by solving another problem. If command"
+              " open impact was run before, the id of the problem can be specified. Otherwise, a list of parameters"
+              " can be given\n"
+              " check - List the problems that are both known to be tractable and intractable, with a shortest"
+              " proof of each\n"
+              " plan k - Choose k open problems to attack next, so as to solve as many open problems as possible"
+              " whatever their outcome\n"
+              " compile - Remove the reductions that follow from the others, and list them\n"
+              " collapse - Merge the parameters that user reductions make interchangeable into single parameters,"
+              " and list the parameters absorbed by others\n"
+              " save filename - Save the current state in a file\n"
+              " journal filename - Keep the current state in a journal file, where every later edit is appended as"
+              " soon as it is made\n"
+              " load filename - Load a parameterized problem, or a journal\n"
+              " stats [on|off|reset] - Show the nodes expanded and successors generated by searches, and the time"
+              " spent in each phase of the commands run since instrumentation was turned on\n"
+              "Format:\n"
+              " [params..] - List of parameters, with whitespace \" \" as separator\n"
+              " [reduction] - List of parameters separated by character \">\""
+              )
+
+    elif command[0] == "init":
+        problem = ParameterizedProblem(store_path=args.store)
+        guided = False
+        if len(command) > 1 and (command[1] == "g" or command[1] == "guided"):
+            guided = True
+        problem.manual_initialization(guided=guided)
+
+    elif command[0] == "add":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+
+        if len(command) > 1:
+            if command[1] == "tractable":
+                print("Problem: ", end="")
+                problem.add_problem(Tractability.TRACTABLE)
+            elif command[1] == "intractable":
+                print("Problem: ", end="")
+                problem.add_problem(Tractability.INTRACTABLE)
+            elif command[1] == "reduction":
+                problem.add_reduction()
+        else:
+            print("Usage: add tractable|intractable|reduction")
+
+    elif command[0] == "solve":
+        shortest = "--shortest" in command
+        if shortest:
+            command.remove("--shortest")
+        if len(command) > 2:
+            current_parameters = frozenset(command[2:])
+            if command[1] == "intractable":
+                problem.solve(current_parameters, tractability=Tractability.INTRACTABLE, shortest=shortest)
+                return problem
+            elif command[1] == "tractable":
+                problem.solve(current_parameters, tractability=Tractability.TRACTABLE, shortest=shortest)
+                return problem
+            else:
+                print(f"Unknown value: {command[1]}")
+        else:
+            print("Usage: solve tractable|intractable [--shortest] params*")
+            return problem
+
+    elif command[0] == "saturate":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        if len(command) > 1 and command[1] == "dfs":
+            problem.saturate(method="dfs")
+        else:
+            problem.saturate(workers=args.workers)
+
+    elif command[0] == "open":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        impact = len(command) > 1 and command[1] == "impact"
+        selection = parse_open_options(command[2 if impact else 1:])
+        if selection is None:
+            print("Usage: open [impact] [--limit n] [--offset n] [--size n|min-max] [--include params,..]"
+                  " [--exclude params,..] [--minimal|--maximal]")
+            return problem
+        problem.open_problems(impact=impact, workers=args.workers, **selection)
+
+    elif command[0] == "check":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        problem.check(workers=args.workers)
+
+    elif command[0] == "plan":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        if len(command) > 1 and command[1].isdigit():
+            problem.print_plan(int(command[1]), workers=args.workers)
+        else:
+            print("Usage: plan k")
+
+    elif command[0] == "compile":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        problem.compile()
+
+    elif command[0] == "collapse":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        problem.collapse()
+
+    elif command[0] == "impact":
+        if problem is None:
+            print("You must initialize the problem fist")
+            return problem
+        if len(command) > 1:
+            if command[1].isdigit():
+                problem.print_known_impact(int(command[1]))
             else:
-                print("You must specify a file name")
+                current_parameters = frozenset(command[1:])
+                problem.print_impact(current_parameters)
+
+    elif command[0] == "save":
+        if len(command) > 1:
+            problem.save(command[1])
+        else:
+            print("You must specify a file name")
+
+    elif command[0] == "journal":
+        if problem is None:
+            print("You must initialize the problem first")
+            return problem
+        if len(command) > 1:
+            problem.start_journal(command[1])
+        else:
+            print("You must specify a file name")
+
+    elif command[0] == "load":
+        if len(command) > 1:
+            problem = ParameterizedProblem(store_path=args.store)
+            if problem.load(command[1], use_cache=args.cache, workers=args.workers) and args.collapse:
+                problem.collapse()
+        else:
+            print("You must specify a file name")
+
+    elif command[0] == "stats":
+        if len(command) > 1 and command[1] in ["on", "off"]:
+            STATS.enabled = command[1] == "on"
+            print(f"Instrumentation turned {command[1]}")
+        elif len(command) > 1 and command[1] == "reset":
+            STATS.reset()
+            print("Counters reset")
+        else:
+            print_stats(args.profile or None)
+
+    else:
+        print("Unknown command")
+
+    return problem
 
-        elif command[0] == "exit":
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    # An empty profile path only turns the counters on
+    STATS.enabled = args.profile is not None
+    profile_path = args.profile or None
+
+    if args.batch:
+        with instrument.profiled(profile_path):
+            status = batch_main(args)
+        if STATS.enabled:
+            print_stats(profile_path, file=sys.stderr)
+        return status
+
+    if args.serve:
+        if not args.filename:
+            print("Server mode needs a problem file, given with -f", file=sys.stderr)
+            return 1
+        if args.store:
+            print("Server mode keeps its snapshots in memory, and does not support --store", file=sys.stderr)
+            return 1
+
+        problem = ParameterizedProblem()
+        if not problem.load(args.filename, verbose=False, use_cache=args.cache, workers=args.workers):
+            print(f"Could not load file {args.filename}", file=sys.stderr)
+            return 1
+        if args.collapse:
+            problem.collapse_result()
+        if not problem.saturated:
+            problem.saturate_result(workers=args.workers)
+
+        import server
+        server.serve(problem, args.serve, serve_query, SERVER_WRITES, threads=args.threads)
+        return 0
+
+    print(f"Parameterized problem finder v{VERSION}")
+    problem = None
+    if args.filename:
+        problem = ParameterizedProblem(store_path=args.store)
+        if problem.load(args.filename, use_cache=args.cache, workers=args.workers) and args.collapse:
+            problem.collapse()
+
+    while True:
+        command = prompt().split()
+
+        if len(command) == 0:
+            continue
+
+        if command[0] == "exit":
             print("Goodbye!")
             return 0
 
-        else:
-            print("Unknown command")
+        # Every command that does some work is timed and profiled on its own, and dumped to the profile path
+        measured = command[0] in MEASURED_COMMANDS
+        with STATS.phase(command[0] if measured else None), instrument.profiled(profile_path if measured else None):
+            problem = run_command(problem, command, args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import mmap
+
+from lattice import Lattice, bit_indices, popcount
+
+# Out-of-core status of every problem of a lattice, for classes too large for in-memory bitsets. The status takes
+# 2 bits per problem, in two planes of one bit each, in a memory-mapped file:
+# 0 unknown, 1 tractable, 2 intractable, 3 conflict (both tractable and intractable)
+#
+# Planes are cut in chunks of 2^chunk_bits problems sharing the same high parameters. Every pass reads and writes
+# one chunk at a time as a bitset over the low parameters, so memory stays bounded by a few chunks
+
+UNKNOWN, TRACTABLE, INTRACTABLE, CONFLICT = range(4)
+
+
+class LatticeStore:
+    def __init__(self, path, size, chunk_bits=20):
+        self.path = path
+        self.size = size
+        # At least a byte per chunk, so that the planes are plain bitsets over the whole lattice
+        self.chunk_bits = min(size, max(chunk_bits, 3))
+        self.high_bits = size - self.chunk_bits
+        self.chunk_count = 1 << self.high_bits
+        self.chunk_bytes = max(1, (1 << self.chunk_bits) // 8)
+        self.plane_bytes = self.chunk_count * self.chunk_bytes
+
+        # Bitsets over the problems of one chunk, where mask 0 is a problem too unless the chunk is the first one
+        self.low = Lattice(range(self.chunk_bits))
+        self.low_mask = (1 << self.chunk_bits) - 1
+        self.chunk_full = (1 << (1 << self.chunk_bits)) - 1
+
+        # Truncating the file first leaves it filled with zeros, that is unknown problems
+        self.file = open(path, "a+b")
+        self.file.truncate(0)
+        self.file.truncate(2 * self.plane_bytes)
+        self.memory = mmap.mmap(self.file.fileno(), 2 * self.plane_bytes)
+
+    def close(self):
+        self.memory.close()
+        self.file.close()
+
+    def clear(self):
+        zeros = bytes(self.chunk_bytes)
+        for offset in range(0, 2 * self.plane_bytes, self.chunk_bytes):
+            self.memory[offset:offset + self.chunk_bytes] = zeros
+
+    # Plane 0 holds tractable problems, plane 1 intractable ones
+    def read(self, plane, chunk):
+        offset = plane * self.plane_bytes + chunk * self.chunk_bytes
+        return int.from_bytes(self.memory[offset:offset + self.chunk_bytes], "little")
+
+    def write(self, plane, chunk, bitset):
+        offset = plane * self.plane_bytes + chunk * self.chunk_bytes
+        self.memory[offset:offset + self.chunk_bytes] = bitset.to_bytes(self.chunk_bytes, "little")
+
+    def status(self, mask):
+        status = UNKNOWN
+        for plane in [0, 1]:
+            if self.memory[plane * self.plane_bytes + (mask >> 3)] >> (mask & 7) & 1:
+                status |= 1 << plane
+
+        return status
+
+    def add(self, plane, mask):
+        offset = plane * self.plane_bytes + (mask >> 3)
+        self.memory[offset] |= 1 << (mask & 7)
+
+    def count(self, plane):
+        return sum(popcount(self.read(plane, chunk)) for chunk in range(self.chunk_count))
+
+    # Problems of the given status including every parameter of include and none of exclude, in increasing
+    # order. Chunks outside of this sub-lattice are skipped without being read. With boundary "minimal" (resp.
+    # "maximal"), only the selected problems with no lower (resp. upper) cover selected are listed
+    def problems(self, status=UNKNOWN, include=0, exclude=0, boundary=None):
+        include_high, exclude_high = include >> self.chunk_bits, exclude >> self.chunk_bits
+
+        def in_range(chunk):
+            return chunk & include_high == include_high and chunk & exclude_high == 0
+
+        def select(chunk):
+            return self._select(status, chunk, include & self.low_mask, exclude & self.low_mask)
+
+        for chunk in range(self.chunk_count):
+            if not in_range(chunk):
+                continue
+
+            selected = select(chunk)
+            if boundary is not None:
+                covered = 0
+                for i, layer in enumerate(self.low.layers()):
+                    if boundary == "minimal":
+                        covered |= (selected & ~layer) << (1 << i)
+                    else:
+                        covered |= (selected & layer) >> (1 << i)
+
+                for i in range(self.high_bits):
+                    bit = 1 << i
+                    neighbour = chunk ^ bit
+                    if (boundary == "minimal") == (chunk & bit != 0) and in_range(neighbour):
+                        covered |= select(neighbour)
+                selected &= ~covered
+
+            for low in self.low.members(selected):
+                yield chunk << self.chunk_bits | low
+
+    def _select(self, status, chunk, include, exclude):
+        tractable, intractable = self.read(0, chunk), self.read(1, chunk)
+        selected = [~tractable, tractable][status & 1] & [~intractable, intractable][status >> 1 & 1]
+        selected &= self._supersets(include) & self._disjoint(exclude)
+
+        return self._problems_of(chunk, selected)
+
+    # Closure of both planes under natural reductions: tractable problems are closed under supersets, intractable
+    # ones under subsets. Within chunks first, then between chunks along every high parameter
+    def close_planes(self):
+        for chunk in range(self.chunk_count):
+            self.write(0, chunk, self._up(self.read(0, chunk)))
+            self.write(1, chunk, self._problems_of(chunk, self._down(self.read(1, chunk))))
+
+        for i in range(self.high_bits):
+            bit = 1 << i
+            for chunk in range(self.chunk_count):
+                if chunk & bit:
+                    continue
+                self.write(0, chunk | bit, self.read(0, chunk | bit) | self.read(0, chunk))
+                self.write(1, chunk, self.read(1, chunk) | self._problems_of(chunk, self.read(1, chunk | bit)))
+
+    # Same passes as Lattice.tractable_pass and Lattice.intractable_pass, one target chunk at a time. Return
+    # whether anything was added
+    def tractable_pass(self, initial, final):
+        initial_high, initial_low = initial >> self.chunk_bits, initial & self.low_mask
+        final_high, final_low = final >> self.chunk_bits, final & self.low_mask
+        excluded_high, excluded_low = (final_high & ~initial_high), (final_low & ~initial_low)
+        changed = False
+
+        for chunk in range(self.chunk_count):
+            if chunk & initial_high != initial_high or chunk & excluded_high:
+                continue
+
+            source = self.read(0, chunk | final_high)
+            released = self._release(source & self._supersets(final_low), final_low)
+            new = released & self._supersets(initial_low) & self._disjoint(excluded_low)
+            changed |= self._merge(0, chunk, new)
+
+        return changed
+
+    def intractable_pass(self, initial, final):
+        initial_high, initial_low = initial >> self.chunk_bits, initial & self.low_mask
+        final_high, final_low = final >> self.chunk_bits, final & self.low_mask
+        changed = False
+
+        for chunk in range(self.chunk_count):
+            if chunk & final_high != final_high or (chunk & ~final_high) & initial_high:
+                continue
+
+            source = self.read(1, (chunk & ~final_high) | initial_high)
+            released = self._release(source & self._supersets(initial_low), initial_low)
+            new = ((released & self._disjoint(final_low | initial_low)) << final_low) & self.chunk_full
+            changed |= self._merge(1, chunk, new)
+
+        return changed
+
+    # Fixpoint of natural reductions and of the given user reductions, as (initial, final) masks
+    def saturate(self, rules):
+        while True:
+            self.close_planes()
+            changed = False
+            for initial, final in rules:
+                changed |= self.tractable_pass(initial, final)
+                changed |= self.intractable_pass(initial, final)
+
+            if not changed:
+                return
+
+    def _merge(self, plane, chunk, new):
+        new = self._problems_of(chunk, new)
+        current = self.read(plane, chunk)
+        if new & ~current == 0:
+            return False
+
+        self.write(plane, chunk, current | new)
+        return True
+
+    # The empty problem is not part of the lattice
+    def _problems_of(self, chunk, bitset):
+        return bitset & ~1 if chunk == 0 else bitset
+
+    # Chunk bitset operations, as in Lattice but without excluding mask 0
+    def _up(self, bitset):
+        for i, layer in enumerate(self.low.layers()):
+            bitset |= (bitset & ~layer) << (1 << i)
+
+        return bitset & self.chunk_full
+
+    def _down(self, bitset):
+        for i, layer in enumerate(self.low.layers()):
+            bitset |= (bitset & layer) >> (1 << i)
+
+        return bitset
+
+    def _supersets(self, mask):
+        bitset = self.chunk_full
+        for i in bit_indices(mask):
+            bitset &= self.low.layers()[i]
+
+        return bitset
+
+    def _disjoint(self, mask):
+        bitset = self.chunk_full
+        for i in bit_indices(mask):
+            bitset &= ~self.low.layers()[i]
+
+        return bitset
+
+    def _release(self, bitset, mask):
+        return self.low._release(bitset, mask)
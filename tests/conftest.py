@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+
+# The modules of the solver sit at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solver import ParameterizedProblem, Tractability  # noqa: E402
+
+TRACTABILITIES = [Tractability.TRACTABLE, Tractability.INTRACTABLE]
+
+
+# Random class over size parameters. Tractable problems tend to be large and intractable ones small, as in known
+# classes. With absorbing, that many pairs of parameters are made to absorb one another, both ways with probability
+# mutual. With redundant, reductions that follow from the others are added: duplicates, natural reductions, and
+# reductions with a larger initial problem
+def random_problem(seed, size=6, reductions=6, absorbing=0, mutual=0.7, redundant=False):
+    generator = random.Random(seed)
+    problem = ParameterizedProblem()
+    problem.name = "T"
+    problem.set_parameters([f"p{i}" for i in range(size)])
+    full = problem.lattice.full
+
+    def mask(large):
+        while True:
+            first, second = generator.getrandbits(size), generator.getrandbits(size)
+            if (first | second if large else first & second) & full:
+                return (first | second if large else first & second) & full
+
+    for _ in range(generator.randint(1, 3)):
+        problem._register_problem(mask(True), Tractability.TRACTABLE)
+    for _ in range(generator.randint(1, 3)):
+        problem._register_problem(mask(False), Tractability.INTRACTABLE)
+
+    rules = []
+    for _ in range(reductions):
+        rules.append((mask(False), mask(False)))
+    for _ in range(absorbing):
+        first, second = generator.sample([1 << i for i in range(size)], 2)
+        rules.append((first, first | second))
+        if generator.random() < mutual:
+            rules.append((second, first | second))
+    if redundant:
+        initial_problem, final_problem = rules[0]
+        rules.append((initial_problem | final_problem, initial_problem))
+        rules.append((initial_problem | (1 << generator.randrange(size)), final_problem))
+
+    for initial_problem, final_problem in rules:
+        problem._add_reduction(initial_problem, final_problem)
+    # Only loaded files hold duplicate reductions, as adding a reduction twice does nothing
+    if redundant:
+        problem.reductions[rules[0][0]].append(rules[0][1])
+        problem.antireductions[rules[0][1]].append(rules[0][0])
+
+    return problem
+
+
+def statuses(problem):
+    return [problem._known(tractability).bitset() for tractability in TRACTABILITIES]
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import solver
+from solver import ParameterizedProblem, Tractability
+
+
+@pytest.fixture
+def problem_file(tmp_path):
+    problem = ParameterizedProblem()
+    problem.name = "T"
+    problem.set_parameters(["a", "b", "c", "d", "e"])
+    problem.register_problem(["a", "b", "c"], Tractability.TRACTABLE)
+    problem.register_problem(["d", "e"], Tractability.INTRACTABLE)
+    problem.register_reduction(["a"], ["d"])
+    path = str(tmp_path / "T.json")
+    assert problem.save(path, verbose=False)
+    return path
+
+
+# Runs batch mode on the given lines, and returns the JSON result of every query
+def run(problem_file, tmp_path, capsys, lines):
+    queries = tmp_path / "queries.txt"
+    queries.write_text("\n".join(lines) + "\n")
+    assert solver.main(["-f", problem_file, "--batch", str(queries), "--json", "--no-cache"]) == 0
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_batch_answers_every_query(problem_file, tmp_path, capsys):
+    queries = ["solve tractable a b c e", "solve intractable d", "classify a b c d", "classify d", "classify a b",
+               "solve tractable x", "frobnicate"]
+    results = run(problem_file, tmp_path, capsys, ["# comment", ""] + queries)
+
+    assert [result["query"] for result in results] == queries
+    assert [result["status"] for result in results] == \
+        ["solved", "solved", "tractable", "intractable", "open", "error", "error"]
+    assert results[0]["proof"] == [["a", "b", "c", "e"], ["a", "b", "c"]]
+    assert all(result["time"] >= 0 for result in results)
+
+
+# A bare --shortest is a malformed line, reported without stopping the queries after it
+def test_batch_shortest_lines(problem_file, tmp_path, capsys):
+    results = run(problem_file, tmp_path, capsys, ["solve --shortest tractable a b c e", "--shortest",
+                                                   "classify --shortest d", "solve tractable --shortest"])
+
+    assert [result["status"] for result in results] == ["solved", "error", "intractable", "error"]
+    assert results[0]["proof"] == [["a", "b", "c", "e"], ["a", "b", "c"]] and results[0]["expanded"] > 0
+    assert results[1]["error"] == "Unknown command"
+    assert "expanded" in results[2]
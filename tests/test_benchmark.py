@@ -0,0 +1,25 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_runs_every_operation(tmp_path, capsys):
+    path = str(tmp_path / "results.json")
+    assert benchmark.main(["run", "--parameters", "6", "--reductions", "5", "--queries", "2", "--seeds", "0,1",
+                           "-o", path]) == 0
+    with open(path) as f:
+        report = json.load(f)
+
+    operations = ["saturate", "solve", "solve_shortest", "open", "impact", "open_impact", "check", "plan"]
+    assert [result["operation"] for result in report["results"]] == operations * 2
+    for result in report["results"]:
+        assert result["parameters"] == 6 and result["time"] >= 0 and result["peak_memory"] > 0
+
+    by_operation = {result["operation"]: result for result in report["results"][:len(operations)]}
+    assert by_operation["open_impact"]["open"] == by_operation["open"]["open"]
+    assert 0 < by_operation["plan"]["steps"] <= 2 and by_operation["check"]["conflicts"] == 0
+
+    # Comparing a report to itself finds no change
+    assert benchmark.main(["compare", path, path]) == 0
+    output = capsys.readouterr().out.splitlines()[1:]
+    assert len(output) == len(report["results"]) and not any("slower" in line for line in output)
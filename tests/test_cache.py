@@ -0,0 +1,126 @@
+import json
+import os
+import stat
+
+import pytest
+
+import cache
+from conftest import TRACTABILITIES, random_problem, statuses
+from solver import ParameterizedProblem, Tractability
+
+
+def saved_problem(path):
+    problem = ParameterizedProblem()
+    problem.name = "T"
+    problem.set_parameters(["a", "b", "c", "d", "e"])
+    problem.register_problem(["a", "b", "c"], Tractability.TRACTABLE)
+    problem.register_problem(["d", "e"], Tractability.INTRACTABLE)
+    problem.register_reduction(["a"], ["d"])
+    problem.register_reduction(["b", "e"], ["c"])
+    problem.saturate_result()
+    assert problem.save(path, verbose=False)
+    return problem
+
+
+def load(path, use_cache=True):
+    problem = ParameterizedProblem()
+    assert problem.load(path, verbose=False, use_cache=use_cache)
+    return problem
+
+
+def proofs(problem):
+    return [dict(problem._proofs(tractability).items()) for tractability in TRACTABILITIES]
+
+
+# What the queries of a loaded problem answer
+def answers(problem):
+    if not problem.saturated:
+        problem.saturate_result()
+    shortest = [problem.solve_result(problem.lattice.to_problem(mask), tractability, shortest=True)
+                for mask in problem.lattice.powerset() for tractability in TRACTABILITIES]
+    return statuses(problem), proofs(problem), shortest, problem.check_result()
+
+
+def saturate(*args, **kwargs):
+    raise AssertionError("saturated instead of read from the cache")
+
+
+def test_cache_written_by_load(tmp_path, monkeypatch):
+    path = str(tmp_path / "T.json")
+    saved_problem(path)
+    assert not os.path.exists(cache.cache_path(path))
+
+    load(path)
+    assert os.path.exists(cache.cache_path(path))
+    monkeypatch.setattr(ParameterizedProblem, "saturate", saturate)
+    assert load(path).saturated
+
+
+# Loading gives the same state whether the cache is used or not, even when the saved problem was saturated along
+# another history than the loaded one
+@pytest.mark.parametrize("seed", range(10))
+def test_cache_hit_matches_miss(tmp_path, seed):
+    path = str(tmp_path / "T.json")
+    if seed == 0:
+        saved_problem(path)
+    else:
+        problem = random_problem(seed, reductions=8)
+        problem.saturate_result()
+        problem.register_reduction(*[problem.lattice.to_problem(mask) for mask in [3, 12]])
+        assert problem.save(path, verbose=False)
+
+    missed = load(path)
+    hit = load(path)
+    assert answers(hit) == answers(missed) == answers(load(path, use_cache=False))
+
+
+def test_cache_ignores_order(tmp_path):
+    path = str(tmp_path / "T.json")
+    saved_problem(path)
+    problem = load(path)
+    with open(path) as f:
+        data = json.load(f)
+
+    shuffled = dict(data, parameters=" ".join(reversed(data["parameters"].split())),
+                    tractable=dict(reversed(list(data["tractable"].items()))))
+    assert cache.content_hash(shuffled) == cache.content_hash(data)
+    assert cache.read_cache(path, cache.content_hash(shuffled), problem.lattice.size) is not None
+
+
+def test_cache_invalidated_by_content(tmp_path):
+    path = str(tmp_path / "T.json")
+    saved_problem(path)
+    with open(path) as f:
+        data = json.load(f)
+    data["tractable"]["c d"] = []
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+    assert cache.read_cache(path, cache.content_hash(data), 5) is None
+    loaded = ParameterizedProblem()
+    assert loaded.load(path, verbose=False)
+
+    expected = ParameterizedProblem()
+    expected.load(path, verbose=False, use_cache=False)
+    expected.saturate_result()
+    assert statuses(loaded) == statuses(expected)
+
+    # Loading rewrote the cache for the new content
+    assert cache.read_cache(path, cache.content_hash(data), 5) is not None
+
+
+def test_cache_keeps_file_mode(tmp_path):
+    path = str(tmp_path / "T.json")
+    saved_problem(path)
+    load(path)
+    os.chmod(cache.cache_path(path), 0o640)
+
+    # A changed file gets a new cache in place of the previous one
+    with open(path) as f:
+        data = json.load(f)
+    data["tractable"]["c d"] = []
+    with open(path, "w") as f:
+        json.dump(data, f)
+    load(path)
+    assert cache.read_cache(path, cache.content_hash(data), 5) is not None
+    assert stat.S_IMODE(os.stat(cache.cache_path(path)).st_mode) == 0o640
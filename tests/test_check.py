@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from conftest import TRACTABILITIES, random_problem
+from solver import Tractability
+
+
+# Random problem made inconsistent by declaring some of its known problems of the other tractability
+def conflicting_problem(seed):
+    problem = random_problem(seed, reductions=8)
+    problem.saturate_result()
+    generator = random.Random(seed)
+    for tractability, other in [TRACTABILITIES, TRACTABILITIES[::-1]]:
+        known = list(problem.lattice.members(problem._known(tractability).bitset()))
+        for conflict in generator.sample(known, min(2, len(known))):
+            problem._register_problem(conflict, other)
+
+    return problem
+
+
+# Whether a compacted proof, written from the problem to a registered one, only takes natural and user steps
+def valid_path(problem, path, tractability):
+    if tractability == Tractability.TRACTABLE:
+        return all(succ != current and (succ & current == succ or succ in problem.get_user_reductions(current))
+                   for current, succ in zip(path, path[1:]))
+    return all(succ != current and (succ & current == current or succ in problem.get_user_antireductions(current))
+               for current, succ in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_backward_proofs_match_forward(seed):
+    problem = conflicting_problem(seed)
+    conflicts = problem._check()
+    assert [conflict for conflict, _, _ in conflicts] == \
+        list(problem.lattice.members(problem.tractable.bitset() & problem.intractable.bitset()))
+    assert len(conflicts) > 0
+
+    for conflict, tractable_proof, intractable_proof in conflicts:
+        for tractability, proof in zip(TRACTABILITIES, [tractable_proof, intractable_proof]):
+            forward, _ = problem.get_shortest_proof(conflict, tractability)
+            path = problem._compact_proof(proof)
+            if forward is None:
+                assert proof == problem.get_proof(conflict, tractability)
+            else:
+                assert len(path) == len(problem._compact_proof(forward))
+
+            # Proofs are written from the problem to a registered one if tractable, the other way otherwise
+            if tractability == Tractability.INTRACTABLE:
+                path.reverse()
+            assert path[0] == conflict and path[-1] in problem._proofs(tractability).registered()
+            assert forward is None or valid_path(problem, path, tractability)
+
+    assert len(problem.check_result()) == len(conflicts)
+
+
+# Backward search gives proofs as short as the forward one for any problem, known or not
+@pytest.mark.parametrize("seed", range(20))
+def test_shortest_proofs_match_each_proof(seed):
+    problem = random_problem(seed, size=5)
+    problems = list(problem.lattice.powerset())
+
+    for tractability in TRACTABILITIES:
+        proofs = problem.get_shortest_proofs(problems, tractability)
+        for start in problems:
+            forward, _ = problem.get_shortest_proof(start, tractability)
+            if forward is None:
+                assert proofs[start] is None
+            else:
+                assert len(problem._compact_proof(proofs[start])) == len(problem._compact_proof(forward))
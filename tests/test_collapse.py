@@ -0,0 +1,68 @@
+import pytest
+
+from conftest import random_problem
+from solver import ParameterizedProblem
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_collapse_keeps_classifications(seed):
+    problem = random_problem(seed, absorbing=3)
+    problem.saturate_result()
+    lattice = problem.lattice
+    before = {mask: (mask in problem.tractable, mask in problem.intractable) for mask in lattice.powerset()}
+
+    result = problem.collapse_result()
+    assert problem.lattice.size == lattice.size - sum(len(members) - 1 for members in result.classes)
+    for mask, classification in before.items():
+        collapsed = problem.lattice.to_mask(lattice.to_problem(mask))
+        assert (collapsed in problem.tractable, collapsed in problem.intractable) == classification
+
+
+def test_collapse_merges_mutual_absorptions():
+    problem = ParameterizedProblem()
+    problem.set_parameters(["a", "b", "c"])
+    problem.register_reduction(["a"], ["a", "b"])
+    problem.register_reduction(["b"], ["a", "b"])
+
+    assert problem.collapse_result().classes == [frozenset(["a", "b"])]
+    assert problem.lattice.size == 2
+
+
+def test_collapse_restricts_to_canonical_problems():
+    problem = ParameterizedProblem()
+    problem.set_parameters(["f", "o", "x"])
+    problem.register_reduction(["f"], ["f", "o"])
+
+    result = problem.collapse_result()
+    assert result.classes == [] and result.dominated == [(frozenset(["o"]), frozenset(["f"]))]
+    assert sorted(map(sorted, problem.open_problems_result())) == \
+        [["f", "o"], ["f", "o", "x"], ["o"], ["o", "x"], ["x"]]
+
+
+# Impacts over canonical problems are the canonical problems among the impacts over every problem
+@pytest.mark.parametrize("seed", range(30))
+def test_restricted_impacts_match(seed):
+    problem = random_problem(seed, absorbing=3, mutual=0.3)
+    problem.saturate_result()
+    problem.collapse_result()
+    lattice = problem.lattice
+    absorbed = lattice.absorbed
+
+    lattice.restrict({})
+    every = list(problem._open_problems())
+    every_impacts = problem._impact_bitsets(every)
+    single_impacts = [problem.impact(open_problem) for open_problem in every]
+
+    lattice.restrict(absorbed)
+    canonical = list(problem._open_problems())
+    assert canonical == [open_problem for open_problem in every if lattice.canonical(open_problem) == open_problem]
+
+    impacts = problem._impact_bitsets(canonical, workers=2 if seed < 3 else 1)
+    for direction, tractability in enumerate(["tractable", "intractable"]):
+        for i, open_problem in enumerate(canonical):
+            j = every.index(open_problem)
+            expected = {every[k] for k in lattice.members(every_impacts[direction][j])
+                        if lattice.canonical(every[k]) == every[k]}
+            assert {canonical[k] for k in lattice.members(impacts[direction][i])} == expected
+            assert set(problem.impact(open_problem)[tractability]) == \
+                {solved for solved in single_impacts[j][tractability] if lattice.canonical(solved) == solved}
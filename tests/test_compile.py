@@ -0,0 +1,18 @@
+import pytest
+
+from conftest import random_problem, statuses
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_compile_keeps_closures(seed):
+    original = random_problem(seed, reductions=8, absorbing=2, redundant=True)
+    compiled = random_problem(seed, reductions=8, absorbing=2, redundant=True)
+
+    result = compiled.compile_result()
+    assert len(result.duplicates) >= 1 and len(result.natural) >= 1
+    assert sum(len(finals) for finals in compiled.reductions.values()) < \
+        sum(len(finals) for finals in original.reductions.values())
+
+    original.saturate_result()
+    compiled.saturate_result()
+    assert statuses(compiled) == statuses(original)
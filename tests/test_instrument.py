@@ -0,0 +1,21 @@
+from conftest import random_problem
+from instrument import STATS
+
+
+# What workers count is added to the counters of the parent process
+def test_parallel_counts_match():
+    counts = []
+    for workers in [1, 3]:
+        problem = random_problem(4, size=7, reductions=10)
+        STATS.enabled = True
+        STATS.reset()
+        try:
+            problem.saturate_result(workers=workers)
+            problem._impact_bitsets(list(problem._open_problems()), workers=workers)
+            counts.append(STATS.counts())
+        finally:
+            STATS.enabled = False
+            STATS.reset()
+
+    assert counts[0] == counts[1]
+    assert dict(counts[0]["reachability"])["expanded"] > 0 and dict(counts[0]["saturate"])["passes"] > 0
@@ -0,0 +1,119 @@
+import os
+import stat
+
+import journal
+from conftest import statuses
+from solver import ParameterizedProblem, Tractability
+
+
+def journaled_problem(path):
+    problem = ParameterizedProblem()
+    problem.name = "T"
+    problem.set_parameters(["a", "b", "c", "d"])
+    problem.register_problem(["a", "b", "c"], Tractability.TRACTABLE)
+    problem.register_problem(["d"], Tractability.INTRACTABLE)
+    assert problem.start_journal(path, verbose=False)
+    return problem
+
+
+def load(path):
+    problem = ParameterizedProblem()
+    assert problem.load(path, verbose=False)
+    return problem
+
+
+# Loaded problems come out saturated, so the problems they are compared to must be saturated too
+def state(problem):
+    assert problem.saturated
+    return (problem.lattice.to_mask(problem.parameters), problem.serialize_dic(problem.reductions),
+            statuses(problem))
+
+
+def edits(path):
+    with open(path) as f:
+        return journal.read_journal(f.read())[1]
+
+
+def test_journal_replays_edits(tmp_path):
+    path = str(tmp_path / "T.json")
+    problem = journaled_problem(path)
+    problem.register_reduction(["a"], ["b"])
+    problem.register_problem(["c", "d"], Tractability.TRACTABLE)
+    problem.saturate_result()
+    problem.journal.close()
+
+    assert [record["op"] for record in edits(path)] == ["reduction", "tractable", "saturate"]
+    loaded = load(path)
+    assert state(loaded) == state(problem)
+    assert loaded.journal.records == 3
+    loaded.journal.close()
+
+
+def test_journal_drops_truncated_line(tmp_path):
+    path = str(tmp_path / "T.json")
+    problem = journaled_problem(path)
+    problem.register_reduction(["a"], ["b"])
+    problem.saturate_result()
+    problem.journal.close()
+    with open(path, "a") as f:
+        f.write('{"op": "tractable", "prob')
+
+    loaded = load(path)
+    assert state(loaded) == state(problem)
+
+    # Later edits are appended right after the last complete one
+    loaded.register_problem(["c", "d"], Tractability.TRACTABLE)
+    loaded.journal.close()
+    assert [record["op"] for record in edits(path)] == ["reduction", "saturate", "tractable"]
+    reloaded = load(path)
+    assert state(reloaded) == state(loaded)
+    reloaded.journal.close()
+
+
+def test_journal_counts_edits_up_to_compaction(tmp_path):
+    path = str(tmp_path / "T.json")
+    assert journal.write_snapshot(path, {})
+    log = journal.Journal(path)
+    for _ in range(journal.COMPACT_RECORDS - 1):
+        log.append({"op": "saturate"})
+    assert not log.needs_compaction()
+    log.append({"op": "saturate"})
+    assert log.needs_compaction()
+    log.close()
+
+    with open(path) as f:
+        snapshot, records, length = journal.read_journal(f.read())
+    assert len(records) == journal.COMPACT_RECORDS
+
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    path = str(tmp_path / "T.json")
+    problem = journaled_problem(path)
+    problem.register_reduction(["a"], ["b"])
+    problem.journal.records = journal.COMPACT_RECORDS - 1
+    problem.register_problem(["c", "d"], Tractability.TRACTABLE)
+
+    assert edits(path) == [] and problem.journal.records == 0
+    problem.register_problem(["a", "d"], Tractability.TRACTABLE)
+    problem.saturate_result()
+    problem.journal.close()
+    assert len(edits(path)) == 2
+
+    loaded = load(path)
+    assert state(loaded) == state(problem)
+    loaded.journal.close()
+
+
+def test_snapshot_keeps_file_mode(tmp_path):
+    path = str(tmp_path / "T.json")
+    umask = os.umask(0o022)
+    try:
+        assert journal.write_snapshot(path, {})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    os.chmod(path, 0o640)
+    problem = journaled_problem(path)
+    problem.journal.close()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
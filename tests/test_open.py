@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import random_problem
+from solver import parse_open_options
+
+
+# Open problems with the given parameters, sizes and boundary, found by testing every problem of the lattice
+def brute_force_open(problem, include=(), exclude=(), min_size=1, max_size=None, boundary=None):
+    lattice = problem.lattice
+    include, exclude = problem._parameters_mask(include), problem._parameters_mask(exclude)
+    open_bitset = problem._open_bitset()
+
+    def selected(other):
+        return open_bitset >> other & 1 and other & include == include and other & exclude == 0
+
+    problems = []
+    for other in lattice.powerset():
+        if not selected(other):
+            continue
+        if boundary == "minimal" and any(selected(smaller) for smaller in lattice.powerset()
+                                         if smaller != other and smaller & other == smaller):
+            continue
+        if boundary == "maximal" and any(selected(larger) for larger in lattice.powerset()
+                                         if larger != other and larger & other == other):
+            continue
+        problems.append(other)
+
+    return [other for other in sorted(problems)
+            if min_size <= bin(other).count("1") and (max_size is None or bin(other).count("1") <= max_size)]
+
+
+SELECTIONS = [{}, {"include": ["p0"]}, {"exclude": ["p1", "p2"]}, {"include": ["p3"], "exclude": ["p5"]},
+              {"min_size": 2, "max_size": 3}, {"boundary": "minimal"}, {"boundary": "maximal"},
+              {"boundary": "minimal", "include": ["p2"]}, {"boundary": "maximal", "exclude": ["p4"]}]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_selected_open_problems_match(seed, selection):
+    problem = random_problem(seed, reductions=4)
+    problem.saturate_result()
+    expected = brute_force_open(problem, **selection)
+
+    assert list(problem._select_open(**selection)) == expected
+    assert list(problem.open_problems_result(**selection)) == [problem.lattice.to_problem(other) for other in expected]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_open_problem_pages_cover_selection(seed):
+    problem = random_problem(seed, reductions=4)
+    problem.saturate_result()
+    expected = brute_force_open(problem, include=["p1"])
+
+    for limit in [1, 2, 5]:
+        pages = [list(problem._select_open(include=["p1"], offset=offset, limit=limit))
+                 for offset in range(0, len(expected) + limit, limit)]
+        assert all(len(page) <= limit for page in pages)
+        assert sum(pages, []) == expected
+    assert list(problem._select_open(offset=len(expected) + 1, include=["p1"])) == []
+
+
+def test_parse_open_options():
+    assert parse_open_options(["--minimal", "--include", "p0,p1", "--size", "2-3", "--offset", "4", "--limit", "2"]) \
+        == {"boundary": "minimal", "include": ["p0", "p1"], "min_size": 2, "max_size": 3, "offset": 4, "limit": 2}
+    assert parse_open_options(["--size", "2"]) == {"min_size": 2, "max_size": 2}
+    assert parse_open_options(["--limit"]) is None
+    assert parse_open_options(["--limit", "two"]) is None
+    assert parse_open_options(["--sort", "size"]) is None
+
+
+@pytest.mark.parametrize("impact", [False, True])
+def test_empty_page_is_not_congratulated(capsys, impact):
+    problem = random_problem(0, reductions=4)
+    problem.saturate_result()
+    count = len(brute_force_open(problem))
+    assert count > 0
+
+    problem.open_problems(impact=impact, offset=count)
+    output = capsys.readouterr().out
+    assert "congratulation" not in output and "No open problem matches the selection." in output
+
+    problem.open_problems(impact=impact, offset=count - 1)
+    output = capsys.readouterr().out
+    assert "congratulation" not in output and "No open problem matches" not in output
@@ -0,0 +1,12 @@
+import pytest
+
+from conftest import random_problem
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parallel_impacts_match(seed):
+    problem = random_problem(seed, size=7, reductions=10)
+    problem.saturate_result()
+    open_problems = list(problem._open_problems())
+
+    assert problem._impact_bitsets(open_problems, workers=3) == problem._impact_bitsets(open_problems)
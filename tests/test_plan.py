@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import TRACTABILITIES, random_problem
+
+
+# Open problems solved by solving each open problem, itself included, found by the search of impact
+def brute_force_solves(problem):
+    problems = list(problem._open_problems())
+    solves = []
+    for other in problems:
+        solved = problem.impact(other)
+        solves.append([set(solved[tractability.value]) | {other} for tractability in TRACTABILITIES])
+
+    return problems, solves
+
+
+# Greedy plan recomputing the gain of every open problem at each step, ties going to the first open problem
+def naive_plan(problem, k):
+    problems, solves = brute_force_solves(problem)
+    covered = [set(), set()]
+    steps = []
+    while len(steps) < k:
+        gains = [(len(tractable - covered[0]) + len(intractable - covered[1]), -i)
+                 for i, (tractable, intractable) in enumerate(solves)]
+        if len(gains) == 0 or max(gains)[0] == 0:
+            break
+
+        i = -max(gains)[1]
+        tractable, intractable = solves[i]
+        steps.append((problems[i], len(tractable - covered[0]), len(intractable - covered[1])))
+        covered = [covered[0] | tractable, covered[1] | intractable]
+
+    return steps
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("k", [1, 3, 100])
+def test_lazy_plan_matches_naive(seed, k):
+    problem = random_problem(seed, reductions=6)
+    problem.saturate_result()
+
+    expected = naive_plan(problem, k)
+    assert problem._plan(k) == expected
+    assert [tuple(step) for step in problem.plan_result(k)] == \
+        [(problem.lattice.to_problem(other), tractable, intractable) for other, tractable, intractable in expected]
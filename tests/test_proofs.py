@@ -0,0 +1,107 @@
+from collections import deque
+
+import pytest
+
+from conftest import TRACTABILITIES, random_problem
+from solver import Tractability
+
+
+# Whether every step of a proof, written from the problem to a registered one, follows from the next problem by a
+# natural reduction or a user reduction L > R: from a tractable Q including R, (Q - R) | L is tractable, and from an
+# intractable Q including L, (Q - L) | R is intractable
+def valid_steps(problem, path, tractability):
+    rules = [(initial, final) for initial, finals in problem.reductions.items() for final in finals]
+    for current, succ in zip(path, path[1:]):
+        if tractability == Tractability.TRACTABLE:
+            natural = succ & current == succ
+            derived = any(succ & final == final and (succ & ~final) | initial == current for initial, final in rules)
+        else:
+            natural = succ & current == current
+            derived = any(succ & initial == initial and (succ & ~initial) | final == current
+                          for initial, final in rules)
+        if succ == current or not (natural or derived):
+            return False
+
+    return True
+
+
+# Proofs recorded by saturation and by incremental additions lead every known problem back to a registered one
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("method", ["bitset", "dfs"])
+def test_recorded_proofs_are_valid(seed, method):
+    problem = random_problem(seed, reductions=8)
+    problem.saturate_result(method=method)
+    problem.register_reduction(*[problem.lattice.to_problem(mask) for mask in [3, 12]])
+
+    for tractability in TRACTABILITIES:
+        known = problem._known(tractability)
+        registered = problem._proofs(tractability).registered()
+        for start in problem.lattice.powerset():
+            proof = problem.get_proof(start, tractability)
+            if start not in known:
+                assert proof is None
+                continue
+
+            # Proofs are written from the problem to a registered one if tractable, the other way otherwise
+            path = proof if tractability == Tractability.TRACTABLE else proof[::-1]
+            assert path[0] == start and path[-1] in registered
+            assert valid_steps(problem, path, tractability)
+
+            result = problem.solve_result(problem.lattice.to_problem(start), tractability)
+            assert result.proof == [problem.lattice.to_problem(step) for step in problem._compact_proof(proof)]
+            assert result.expanded == 0
+
+
+# Fewest steps from a problem to a registered one, where a step is a user reduction or any number of natural
+# reductions at once
+def brute_force_steps(problem, start, tractability):
+    lattice = problem.lattice
+    registered = set(problem._proofs(tractability).registered())
+    if tractability == Tractability.TRACTABLE:
+        user_successors = problem.get_user_reductions
+    else:
+        user_successors = problem.get_user_antireductions
+
+    distance = {start: 0}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        if current in registered:
+            return distance[current]
+
+        if tractability == Tractability.TRACTABLE:
+            natural = [other for other in lattice.powerset() if other != current and other & current == other]
+        else:
+            natural = [other for other in lattice.powerset() if other != current and other & current == current]
+        for succ in natural + list(user_successors(current)):
+            if succ not in distance:
+                distance[succ] = distance[current] + 1
+                queue.append(succ)
+
+    return None
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_shortest_proofs_are_minimal(seed):
+    problem = random_problem(seed, size=5)
+
+    for tractability in TRACTABILITIES:
+        for start in problem.lattice.powerset():
+            proof, _ = problem.get_shortest_proof(start, tractability)
+            steps = brute_force_steps(problem, start, tractability)
+            if proof is None:
+                assert steps is None
+                continue
+
+            # Proofs are written from the problem to a registered one if tractable, the other way otherwise
+            path = problem._compact_proof(proof)
+            if tractability == Tractability.INTRACTABLE:
+                path.reverse()
+            assert path[0] == start and path[-1] in problem._proofs(tractability).registered()
+            assert len(path) - 1 == steps
+
+            for current, succ in zip(path, path[1:]):
+                if tractability == Tractability.TRACTABLE:
+                    assert succ & current == succ or succ in problem.get_user_reductions(current)
+                else:
+                    assert succ & current == current or succ in problem.get_user_antireductions(current)
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from conftest import TRACTABILITIES, random_problem, statuses
+from solver import ParameterizedProblem, Tractability
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_bitset_saturation_matches_percolation(seed):
+    bitset, search = random_problem(seed), random_problem(seed)
+    bitset._saturate(method="bitset")
+    search._saturate(method="dfs")
+
+    assert statuses(bitset) == statuses(search)
+
+
+# One pass of a reduction derives, up to natural reductions, what _percolate derives from every known problem
+# with that reduction
+@pytest.mark.parametrize("seed", range(40))
+def test_passes_match_derivations(seed):
+    generator = random.Random(seed)
+    problem = ParameterizedProblem()
+    problem.set_parameters([f"p{i}" for i in range(6)])
+    lattice = problem.lattice
+    initial_problem, final_problem = generator.randint(1, lattice.full), generator.randint(1, lattice.full)
+    problem._add_reduction(initial_problem, final_problem)
+    known = lattice.to_bitset(generator.sample(range(1, lattice.full + 1), 4))
+
+    for tractability in TRACTABILITIES:
+        if tractability == Tractability.TRACTABLE:
+            closed = lattice.up_closure(known)
+            derived = lattice.tractable_pass(closed, initial_problem, final_problem)
+            closure = lattice.up_closure
+        else:
+            closed = lattice.down_closure(known)
+            derived = lattice.intractable_pass(closed, initial_problem, final_problem)
+            closure = lattice.down_closure
+
+        expected = [succ for member in lattice.members(closed)
+                    for succ, rule in problem.get_derivations(member, tractability) if rule is not None]
+        assert closure(derived) == closure(lattice.to_bitset(expected))
+
+
+# Additions to a saturated database find exactly what saturating it again from scratch would
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_saturation_matches_fresh(seed):
+    generator = random.Random(seed)
+    incremental, fresh = random_problem(seed), random_problem(seed)
+    incremental.saturate_result()
+    lattice = incremental.lattice
+
+    for _ in range(5):
+        before = statuses(incremental)
+        first, second = generator.sample(list(lattice.powerset()), 2)
+        tractability = generator.choice(TRACTABILITIES + [None])
+        if tractability is None:
+            newly_found = incremental._add_reduction(first, second)
+            fresh._add_reduction(first, second)
+        else:
+            newly_found = incremental._register_problem(first, tractability)
+            fresh._register_problem(first, tractability)
+
+        fresh.saturated = False
+        fresh.saturate_result()
+        assert statuses(incremental) == statuses(fresh)
+        # A registered problem is not reported as deduced
+        registered = {first} if tractability is not None else set()
+        for known, previous, found in zip(statuses(incremental), before, TRACTABILITIES):
+            assert set(newly_found[found.value]) == set(lattice.members(known & ~previous)) - registered
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import random
+
+import pytest
+
+from conftest import TRACTABILITIES, random_problem, statuses
+from lattice import Lattice
+from server import Server, tcp_address
+from solver import SERVER_WRITES, ParameterizedProblem, ProofStore, Tractability, serve_query
+
+
+# Edits applied to successive write copies give the problem edited in place, and leave the copied ones as they were
+@pytest.mark.parametrize("seed", range(20))
+def test_write_copies_match_edits(seed):
+    generator = random.Random(seed)
+    edited, snapshot = random_problem(seed), random_problem(seed)
+    edited.saturate_result()
+    snapshot.saturate_result()
+
+    def state(problem):
+        return (statuses(problem), problem.serialize_dic(problem.reductions),
+                [list(problem._proofs(tractability).items()) for tractability in TRACTABILITIES])
+
+    snapshots = [(snapshot, state(snapshot))]
+    for _ in range(6):
+        snapshot = snapshot.write_copy()
+        first, second = generator.sample(list(edited.lattice.powerset()), 2)
+        tractability = generator.choice(TRACTABILITIES + [None])
+        for problem in [edited, snapshot]:
+            if tractability is None:
+                problem._add_reduction(first, second)
+            else:
+                problem._register_problem(first, tractability)
+        snapshot.build_caches()
+        snapshots.append((snapshot, state(snapshot)))
+
+    assert state(snapshot) == state(edited)
+    for copied, copied_state in snapshots:
+        assert state(copied) == copied_state
+
+
+# Copies of proof stores, past the size at which their entries are merged into a new shared base, keep every entry
+def test_proof_store_copies_match():
+    generator = random.Random(0)
+    lattice = Lattice([f"p{i}" for i in range(12)])
+    for minimal in [True, False]:
+        flat, copied = ProofStore(lattice, minimal), ProofStore(lattice, minimal)
+        for i in range(3000):
+            if i % 100 == 0:
+                copied = copied.copy()
+            problem = generator.randint(1, lattice.full)
+            predecessor = generator.choice([None, generator.randint(1, lattice.full)])
+            flat.record(problem, predecessor)
+            copied.record(problem, predecessor)
+
+        assert list(copied.items()) == list(flat.items()) and len(copied) == len(flat)
+        assert copied.registered() == flat.registered()
+        for problem in generator.sample(list(lattice.powerset()), 200):
+            assert copied.natural_source(problem) == flat.natural_source(problem)
+
+
+def test_tcp_address():
+    assert tcp_address("8000") == ("127.0.0.1", 8000)
+    assert tcp_address("localhost:8000") == ("localhost", 8000)
+    assert tcp_address("::1:8000") == ("::1", 8000)
+    for path in ["server.sock", "/tmp/server.sock", "sockets/8000", "server:sock", "-1", "./8000"]:
+        assert tcp_address(path) is None
+
+
+def served_problem():
+    problem = ParameterizedProblem()
+    problem.name = "T"
+    problem.set_parameters(["a", "b", "c", "d"])
+    problem.register_problem(["a", "b"], Tractability.TRACTABLE)
+    problem.register_problem(["c"], Tractability.INTRACTABLE)
+    problem.register_reduction(["d"], ["a"])
+    problem.saturate_result()
+    return problem
+
+
+# Answers read back from a Unix socket are those of the queries run one after the other on the problem itself
+def test_server_answers_over_socket(tmp_path):
+    queries = ["classify a b", "solve tractable --shortest a d", "open --limit 2", "# comment", "", "impact b",
+               "add tractable b d", "classify b d", "open", "add reduction c > b", "classify c", "solve", "frobnicate"]
+    path = str(tmp_path / "T.sock")
+    server = Server(served_problem(), serve_query, SERVER_WRITES, threads=2)
+
+    async def session():
+        task = asyncio.create_task(server.run(path, verbose=False))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write("".join(query + "\n" for query in queries).encode())
+        writer.write_eof()
+        answers = [json.loads(line) for line in (await reader.read()).splitlines()]
+        writer.close()
+        task.cancel()
+        return answers
+
+    try:
+        answers = asyncio.run(session())
+    finally:
+        server.executor.shutdown()
+
+    problem = served_problem()
+    expected = []
+    for query in queries:
+        if query and not query.startswith("#"):
+            expected.append(dict(serve_query(problem, query.split()), query=query))
+    for answer in answers:
+        assert answer.pop("time") >= 0
+    assert answers == expected
+    assert [answer["status"] for answer in answers[4:]] == \
+        ["added", "tractable", "ok", "added", "intractable", "error", "error"]
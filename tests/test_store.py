@@ -0,0 +1,30 @@
+import pytest
+
+from conftest import random_problem
+from store import LatticeStore
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_store_matches_memory(seed, tmp_path):
+    memory = random_problem(seed, size=7, absorbing=2, mutual=0)
+    stored = random_problem(seed, size=7, absorbing=2, mutual=0)
+    stored.store = LatticeStore(str(tmp_path / "store"), stored.lattice.size, chunk_bits=3)
+    assert stored.store.chunk_count > 1
+
+    try:
+        memory.saturate_result()
+        stored.saturate_result()
+
+        for problem in memory.lattice.powerset():
+            expected = (problem in memory.tractable) | (problem in memory.intractable) << 1
+            assert stored.store.status(problem) == expected
+
+        for restricted in [False, True]:
+            if restricted:
+                memory.lattice.restrict(memory._absorptions())
+                stored.lattice.restrict(stored._absorptions())
+            for boundary in [None, "minimal", "maximal"]:
+                selection = {"include": 1, "exclude": 2, "boundary": boundary}
+                assert list(stored._open_problems(**selection)) == list(memory._open_problems(**selection))
+    finally:
+        stored.store.close()